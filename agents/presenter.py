@@ -1,5 +1,6 @@
 from state import DataState
 from tools.llm import get_llm
+from tools.metrics import metrics
 
 def presenter_agent(state: DataState):
     """
@@ -36,6 +37,7 @@ def presenter_agent(state: DataState):
         response = llm.invoke(presenter_prompt)
         final_answer = response.content if hasattr(response, 'content') else str(response)
     except Exception as e:
+        metrics.record_error()
         final_answer = f"Error generating final answer: {str(e)}"
 
     return {**state, "final_answer": final_answer}
\ No newline at end of file
@@ -1,44 +1,80 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from state import DataState
-from tools.embeddings import get_embeddings, generate_multimodal_embeddings
+from tools.embeddings import generate_multimodal_embeddings
+from tools.lexical_index import lexical_index_for, reciprocal_rank_fusion
+from tools.vector_index import build_index, query_index
+from tools.metrics import metrics
+
+# "lexical" (BM25 only, no remote calls), "vector" (embedding search) or "hybrid" (both, fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RETRIEVAL_MODES = ["lexical", "vector", "hybrid"]
+# Candidates taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+# In hybrid mode, answer from the lexical results alone if the query embedding takes longer than this
+HYBRID_EMBEDDING_TIMEOUT = float(os.getenv("HYBRID_EMBEDDING_TIMEOUT", "2.0"))
+
+# Runs query embeddings so hybrid retrieval can stop waiting for a slow endpoint
+_query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embedding")
 
 def retriever_agent(state: DataState):
     """
-    Retrieves relevant information from the vector database based on the user query.
+    Retrieves relevant information for the user query from the lexical (BM25) index,
+    the vector database, or both fused with reciprocal rank fusion.
+
+    The PDF's vector index is built once at upload time and passed in through the state as
+    pdf_index, so the only embedding call made here is for the user query; lexical mode makes
+    none. Database schema items loaded alongside the PDF are never retrieved here.
     """
     try:
-        # Get data items from state
-        data_items = state.get("data_items", [])
+        # Get the PDF data items from state; schema items belong to the SQL retriever
+        data_items = [item for item in state.get("data_items", []) if item.get("type") != "schema"]
         
         if not data_items:
             return {**state, "context_docs": "No data available for retrieval."}
         
-        # Get embeddings for the data
-        vector_collection = get_embeddings(dataState=data_items)
-        
+        mode = state.get("retrieval_mode") or RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            return {**state, "context_docs": f"Unknown retrieval mode: {mode}"}
+
+        index = state.get("pdf_index")
         user_query = state["user_query"]
-        query_embedding = generate_multimodal_embeddings(prompt=user_query)
-        
-        if query_embedding is None:
-            return {**state, "context_docs": "Failed to generate query embeddings."}
-        
-        # Query the vector database
-        nearest_results = vector_collection.query(
-            query_embeddings=query_embedding,
-            n_results=min(2, len(data_items))  # Don't exceed available items
-        )
+        lexical_index = lexical_index_for(index, data_items)
+
+        if mode == "lexical":
+            documents = lexical_index.search(user_query, n_results=2)
+        elif mode == "hybrid":
+            # Run in a copy of this context so the embedding is timed as part of this node and request
+            future = _query_executor.submit(contextvars.copy_context().run, generate_multimodal_embeddings, prompt=user_query)
+            lexical_documents = lexical_index.search(user_query, n_results=HYBRID_CANDIDATES)
+            try:
+                query_embedding = future.result(timeout=HYBRID_EMBEDDING_TIMEOUT)
+            except FutureTimeoutError:
+                print("Query embedding timed out, answering from the lexical index")
+                query_embedding = None
+            vector_documents = []
+            if query_embedding is not None:
+                # Fall back to building the index if the caller did not provide one
+                index = index or build_index(data_items)
+                vector_documents = query_index(index, query_embedding, n_results=HYBRID_CANDIDATES)
+            documents = reciprocal_rank_fusion([vector_documents, lexical_documents], n_results=2)
+        else:
+            # Fall back to building the index if the caller did not provide one
+            index = index or build_index(data_items)
+            query_embedding = generate_multimodal_embeddings(prompt=user_query)
+            if query_embedding is None:
+                # Keep answering from the lexical index when the embedding endpoint fails
+                documents = lexical_index.search(user_query, n_results=2)
+                if not documents:
+                    return {**state, "context_docs": "Failed to generate query embeddings."}
+            else:
+                # Query the vector database
+                documents = query_index(index, query_embedding, n_results=2)
         
         # Extract context
-        context_docs = ""
-        if hasattr(nearest_results, 'documents') and nearest_results.documents:
-            if isinstance(nearest_results.documents, list):
-                if len(nearest_results.documents) > 0 and isinstance(nearest_results.documents[0], list):
-                    # Double nested case
-                    context_docs = " ".join([item for sublist in nearest_results.documents for item in sublist])
-                else:
-                    # Single nested case
-                    context_docs = " ".join(nearest_results.documents)
-            else:
-                context_docs = str(nearest_results.documents)
+        if documents:
+            context_docs = " ".join(documents)
         else:
             # Fallback: use the raw data items
             context_docs = " ".join([item.get("text", "") for item in data_items[:3] if item.get("text")])
@@ -46,5 +82,6 @@ def retriever_agent(state: DataState):
         return {**state, "context_docs": context_docs}
         
     except Exception as e:
+        metrics.record_error()
         error_msg = f"Error in retriever agent: {str(e)}"
-        return {**state, "context_docs": error_msg}
\ No newline at end of file
+        return {**state, "context_docs": error_msg}
@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Optional, Set, Tuple
+from tools.lexical_index import tokenize, lexical_index_for
+from tools.metrics import metrics
+
+# "auto" decides locally when the loaded data or the query leaves no doubt and asks the LLM otherwise; "llm" always asks
+ROUTER_MODE = os.getenv("ROUTER_MODE", "auto")
+# Keyword evidence a route needs, with none for the other route, before the LLM is skipped
+ROUTER_MARGIN = int(os.getenv("ROUTER_MARGIN", "2"))
+# PDF terms count as evidence only when they occur in at least this many of its chunks
+ROUTER_MIN_DF = int(os.getenv("ROUTER_MIN_DF", "2"))
+# Routing decisions remembered per (query, loaded data kind)
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "1024"))
+
+DB_KEYWORDS = frozenset(["table", "tables", "database", "select", "query", "sql", "row", "rows", "column", "columns",
+                         "record", "records", "count", "average", "sum", "total", "schema"])
+PDF_KEYWORDS = frozenset(["document", "paper", "text", "image", "figure", "page", "paragraph", "section", "author",
+                          "authors", "abstract", "conclusion", "pdf"])
+
+# Everyday words that any document and any database question may use; they say nothing about the route
+GENERIC_TERMS = frozenset(
+    "about above after again against all also always among any around back because been before being below "
+    "best between big both can come could day days different each early end even every few first following "
+    "get give go good great had her here high his however into just know last least less like little long "
+    "low made make many may me might month months more most much must my new next no not now number numbers "
+    "often old once one only other our out over own per place placed put recent same see several she should "
+    "show since small so some such than their them then there these they those three through time times "
+    "two under until up us use used using very want way we well week weeks while would year years you your "
+    "zero".split()
+)
+
+SCHEMA_IDENTIFIER = re.compile(r"^\s*(?:Table:\s*(\S+)|-\s*([^:\s]+)\s*:)", re.MULTILINE)
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def singular(term: str) -> str:
+    """
+    Crude singular form, so "orders" matches an "order" column and "countries" a "country" one.
+    """
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 4 and term.endswith(("ses", "xes", "ches", "shes")):
+        return term[:-2]
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+def schema_terms(data_items: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Singular tokens of the table and column names found in the schema items.
+    """
+    terms: Set[str] = set()
+    for item in data_items:
+        if item.get("type") == "schema":
+            for table, column in SCHEMA_IDENTIFIER.findall(item.get("text", "")):
+                terms.update(singular(term) for term in tokenize((table or column).replace("_", " ")))
+    return terms
+
+def classify(user_query: str, data_items: List[Dict[str, Any]],
+             index: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], int, int]:
+    """
+    Keyword classifier for queries over mixed PDF and database data.
+
+    Database keywords and table/column names (singular or plural) count
+    towards SQL. Document keywords and terms specific to the PDF count towards
+    retrieval: terms of its lexical index found in at least ROUTER_MIN_DF
+    chunks, leaving out everyday words and schema names. A route is returned
+    only when it has at least ROUTER_MARGIN evidence and the other route has
+    none; otherwise None, so the LLM decides. Returns the route and both scores.
+    """
+    terms = set(tokenize(user_query))
+    schema = schema_terms(data_items)
+    postings = lexical_index_for(index, data_items).postings
+    schema_matches = {term for term in terms if singular(term) in schema}
+    pdf_terms = {term for term in terms - schema_matches - GENERIC_TERMS - DB_KEYWORDS
+                 if term in postings and len(postings[term][0]) >= ROUTER_MIN_DF}
+    sql_score = len(terms & DB_KEYWORDS) + 2 * len(schema_matches)
+    pdf_score = len(terms & PDF_KEYWORDS) + len(pdf_terms - PDF_KEYWORDS)
+    if sql_score >= ROUTER_MARGIN and pdf_score == 0:
+        return "sql_retriever_agent", sql_score, pdf_score
+    if pdf_score >= ROUTER_MARGIN and sql_score == 0:
+        return "retriever_agent", sql_score, pdf_score
+    return None, sql_score, pdf_score
+
+class Router:
+    """
+    Picks the agent for a query, asking the LLM only when it has to.
+
+    When only PDF or only database data is loaded there is a single sensible
+    route. With both, a keyword classifier decides when only one route has
+    evidence. The remaining queries go to the LLM, and its decisions are
+    cached per normalized query and kind of loaded data. Each decision is counted by
+    source in the metrics, along with the LLM calls avoided.
+    """
+
+    def __init__(self, mode: str = ROUTER_MODE, cache_size: int = ROUTER_CACHE_SIZE):
+        self.mode = mode
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, bool, bool], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _decided(self, route: str, source: str) -> str:
+        metrics.inc("rag_router_decisions_total", route=route, source=source)
+        if source != "llm":
+            metrics.inc("rag_router_llm_calls_avoided_total")
+        return route
+
+    def _local_route(self, user_query: str, data_items: List[Dict[str, Any]], has_schema_data: bool,
+                     has_pdf_data: bool, index: Optional[Dict[str, Any]]) -> Tuple[Optional[str], str]:
+        if has_schema_data != has_pdf_data:
+            return ("sql_retriever_agent" if has_schema_data else "retriever_agent"), "single_source"
+        if not has_schema_data:
+            # Nothing loaded: the retriever reports that there is no data
+            return "retriever_agent", "single_source"
+
+        route, _, _ = classify(user_query, data_items, index)
+        if route is not None:
+            return route, "classifier"
+
+        key = (_normalize(user_query), has_schema_data, has_pdf_data)
+        with self._lock:
+            route = self._cache.get(key)
+            if route is not None:
+                self._cache.move_to_end(key)
+        return route, "cache"
+
+    def local_route(self, user_query: str, data_items: List[Dict[str, Any]],
+                    index: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        The route that would be taken without asking the LLM, or None if the LLM would be asked.
+        """
+        if self.mode == "llm":
+            return None
+        has_schema_data = any(item.get("type") == "schema" for item in data_items)
+        has_pdf_data = any(item.get("type") in ["text", "table", "image"] for item in data_items)
+        return self._local_route(user_query, data_items, has_schema_data, has_pdf_data, index)[0]
+
+    def route(self, user_query: str, data_items: List[Dict[str, Any]], llm_route: Callable[[bool, bool], str],
+              index: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Return the next agent. llm_route(has_schema_data, has_pdf_data) asks the LLM.
+        """
+        has_schema_data = any(item.get("type") == "schema" for item in data_items)
+        has_pdf_data = any(item.get("type") in ["text", "table", "image"] for item in data_items)
+        if self.mode != "llm":
+            route, source = self._local_route(user_query, data_items, has_schema_data, has_pdf_data, index)
+            if route is not None:
+                return self._decided(route, source)
+
+        route = llm_route(has_schema_data, has_pdf_data)
+        if self.mode != "llm":
+            key = (_normalize(user_query), has_schema_data, has_pdf_data)
+            with self._lock:
+                self._cache[key] = route
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return self._decided(route, "llm")
+
+# Global router instance
+router = Router()
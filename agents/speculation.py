@@ -0,0 +1,140 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from state import DataState
+from agents.router import router
+from tools.metrics import metrics
+
+# "auto" speculates when PDF and database data are both loaded and the route needs the LLM,
+# "on" whenever both are loaded, "off" never
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "auto")
+
+# State keys a retrieval branch hands on to the rest of the graph
+BRANCH_OUTPUTS = ["context_docs", "sql_query"]
+
+# Runs the branch bodies, so a branch can stop waiting as soon as it has lost
+_branch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-branch")
+
+class Speculation:
+    """
+    Shared by the supervisor and the retrieval branches of one request.
+
+    The supervisor calls decide() with its route. A branch waiting on its
+    agent returns right away when another route is chosen. Its agent cannot be
+    interrupted, so it finishes in the background and its result is discarded;
+    agents call wait_for_route() before a costly step (an LLM call) so a losing
+    branch stops there instead.
+    """
+
+    def __init__(self):
+        self.route: Optional[str] = None
+        self._condition = threading.Condition()
+
+    def decide(self, route: str):
+        with self._condition:
+            self.route = route
+            self._condition.notify_all()
+
+    def wait_for_route(self, branch: str) -> bool:
+        """
+        Block until the supervisor has decided; returns whether it chose this branch.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.route is not None)
+            return self.route == branch
+
+    def run(self, branch: str, agent, state: DataState) -> Optional[Dict[str, Any]]:
+        """
+        Run agent(state) unless the supervisor routes elsewhere first; returns its outputs or None.
+        """
+        if self.route is not None and self.route != branch:
+            return None
+        future = _branch_executor.submit(contextvars.copy_context().run, agent, state)
+
+        def finished(_):
+            with self._condition:
+                self._condition.notify_all()
+
+        future.add_done_callback(finished)
+        with self._condition:
+            self._condition.wait_for(lambda: future.done() or (self.route is not None and self.route != branch))
+        if not future.done():
+            future.cancel()
+            metrics.inc("rag_speculation_branches_total", branch=branch, outcome="cancelled")
+            return None
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Speculative {branch} failed: {e}")
+            return None
+        return {key: result.get(key) for key in BRANCH_OUTPUTS if key in result}
+
+def should_speculate(state: DataState) -> bool:
+    """
+    Whether to start retrieval alongside the supervisor for this request.
+    """
+    if SPECULATIVE_ROUTING == "off":
+        return False
+    data_items = state.get("data_items", [])
+    has_schema_data = any(item.get("type") == "schema" for item in data_items)
+    has_pdf_data = any(item.get("type") in ["text", "table", "image"] for item in data_items)
+    if not (has_schema_data and has_pdf_data):
+        # With a single kind of data the supervisor decides locally, so there is no wait to hide
+        return False
+    return SPECULATIVE_ROUTING == "on" or router.local_route(state["user_query"], data_items, state.get("pdf_index")) is None
+
+def start_speculation(state: DataState):
+    return {"speculation": Speculation()}
+
+def speculative_branch(branch: str, agent):
+    """
+    Graph node running agent speculatively; it writes only its own entry of speculative_results.
+    """
+    def node(state: DataState):
+        outputs = state["speculation"].run(branch, agent, state)
+        return {"speculative_results": {branch: outputs} if outputs is not None else {}}
+    node.__name__ = f"speculative_{branch}"
+    return node
+
+def speculative_supervisor(supervisor):
+    """
+    Graph node running the supervisor and telling the branches which route won.
+    """
+    def node(state: DataState):
+        try:
+            result = supervisor(state)
+        except Exception:
+            # Release branches waiting on the route before the error propagates
+            state["speculation"].decide("")
+            raise
+        state["speculation"].decide(result.get("next"))
+        # Only the route is written; the branches write the other keys of this step
+        return {"next": result.get("next")}
+    node.__name__ = "speculative_supervisor_agent"
+    return node
+
+def join_speculation(state: DataState):
+    """
+    Take the winning branch's outputs, if it finished, into the state.
+    """
+    route = state.get("next")
+    results = state.get("speculative_results", {})
+    for branch in results:
+        if branch != route:
+            metrics.inc("rag_speculation_branches_total", branch=branch, outcome="discarded")
+    outputs = results.get(route)
+    if outputs is not None:
+        metrics.inc("rag_speculation_branches_total", branch=route, outcome="used")
+        return {**state, **outputs, "speculation": None}
+    return {**state, "speculation": None}
+
+def route_after_speculation(state: DataState) -> str:
+    """
+    Continue after the winning branch, or run the chosen agent now if no branch result is usable.
+    """
+    route = state.get("next") or "retriever_agent"
+    if route in state.get("speculative_results", {}):
+        return "sql_executor_agent" if route == "sql_retriever_agent" else "presenter_agent"
+    return route
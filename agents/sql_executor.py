@@ -1,5 +1,7 @@
 from state import DataState
 from database_mcp.client import mcp_client
+from tools.metrics import metrics, ROW_BUCKETS
+from tools.sql_cache import sql_cache
 
 def sql_executor_agent(state: DataState):
     """
@@ -13,18 +15,24 @@ def sql_executor_agent(state: DataState):
             return {**state, "context_docs": "No SQL query available to execute."}
         
         # Execute query through MCP client
-        result = mcp_client.execute_query(sql_query)
+        with metrics.timed("sql_execution"):
+            result = mcp_client.execute_query(sql_query)
         
         if result["success"]:
+            metrics.observe("rag_sql_rows_returned", len(result["results"] or []), buckets=ROW_BUCKETS)
             # Format results for presentation
             formatted_results = format_query_results(result["results"])
             execution_context = f"SQL Query: {sql_query}\n\nQuery Results:\n{formatted_results}"
             return {**state, "context_docs": execution_context}
         else:
+            metrics.record_error()
+            # Do not serve SQL that fails from the cache again
+            sql_cache.discard(sql_query)
             error_context = f"SQL Query: {sql_query}\n\nError executing query: {result['error']}"
             return {**state, "context_docs": error_context}
             
     except Exception as e:
+        metrics.record_error()
         error_msg = f"Error in SQL executor agent: {str(e)}"
         return {**state, "context_docs": error_msg}
 
@@ -1,6 +1,9 @@
 from state import DataState
-from tools.embeddings import get_sql_embeddings, generate_multimodal_embeddings
-from tools.llm import get_llm
+from tools.embeddings import generate_multimodal_embeddings
+from tools.vector_index import namespace_name, build_schema_index, query_index
+from tools.llm import get_llm, LLM_MODEL
+from tools.sql_cache import sql_cache, schema_hash
+from tools.metrics import metrics
 import sqlite3
 import os
 from typing import List, Dict, Any
@@ -28,45 +31,42 @@ def sql_retriever_agent(state: DataState):
         if not schema_texts:
             return {**state, "context_docs": "No valid schema text found for processing."}
         
-        # Get embeddings for the schema data
-        vector_collection = get_sql_embeddings(schema_texts)
-        
+        # Questions answered before against the same schema and model skip the schema lookup and the LLM
         user_query = state["user_query"]
+        schema_fingerprint = schema_hash(schema_texts)
+        cached = sql_cache.get(user_query, schema_fingerprint, LLM_MODEL)
+        if cached is not None:
+            context_with_sql = f"Relevant Schema:\n{cached['schema']}\n\nGenerated SQL Query:\n{cached['sql']}"
+            return {**state, "context_docs": context_with_sql, "sql_query": cached["sql"]}
+        
+        # Schema chunks are embedded at upload; only the question is embedded here
+        source_name = schema_items[0].get("source") or "default"
+        index = state.get("db_index")
+        if not index or index.get("collection") != namespace_name("sql", source_name):
+            # Not indexed at upload (e.g. an older session); a no-op if the schema is already indexed
+            index = build_schema_index(schema_items, source_name)
+        
         query_embedding = generate_multimodal_embeddings(prompt=user_query)
         
         if query_embedding is None:
             return {**state, "context_docs": "Failed to generate query embeddings."}
         
         # Query the vector database to find relevant schema chunks
-        nearest_results = vector_collection.query(
-            query_embeddings=query_embedding,
-            n_results=min(2, len(schema_texts))
-        )
-        
-        # Extract relevant schema information
-        relevant_schema = ""
-        if hasattr(nearest_results, 'documents') and nearest_results.documents:
-            if isinstance(nearest_results.documents, list):
-                if len(nearest_results.documents) > 0:
-                    if isinstance(nearest_results.documents[0], list):
-                        # Double nested case
-                        relevant_schema = "\n\n".join([item for sublist in nearest_results.documents for item in sublist])
-                    else:
-                        # Single nested case
-                        relevant_schema = "\n\n".join(nearest_results.documents)
-                else:
-                    # Fallback to all schema data
-                    relevant_schema = "\n\n".join(schema_texts[:2])
-            else:
-                relevant_schema = str(nearest_results.documents)
-        else:
-            # Fallback to all schema data
-            relevant_schema = "\n\n".join(schema_texts[:2])
+        relevant_docs = query_index(index, query_embedding, n_results=min(2, len(schema_texts)))
+        # Fallback to the first schema chunks
+        relevant_schema = "\n\n".join(relevant_docs or schema_texts[:2])
+        
+        # Run speculatively, the schema lookup overlaps the supervisor but the LLM call waits for its route
+        speculation = state.get("speculation")
+        if speculation is not None and not speculation.wait_for_route("sql_retriever_agent"):
+            return {**state, "context_docs": relevant_schema, "sql_query": None}
         
         # Generate SQL query using LLM
         sql_query = generate_sql_query(user_query, relevant_schema)
         
         if sql_query and not sql_query.startswith("ERROR"):
+            if _cacheable(sql_query):
+                sql_cache.put(user_query, schema_fingerprint, LLM_MODEL, sql_query, relevant_schema)
             # Store both the schema context and generated SQL
             context_with_sql = f"Relevant Schema:\n{relevant_schema}\n\nGenerated SQL Query:\n{sql_query}"
             return {**state, "context_docs": context_with_sql, "sql_query": sql_query}
@@ -76,9 +76,15 @@ def sql_retriever_agent(state: DataState):
             return {**state, "context_docs": error_context, "sql_query": None}
         
     except Exception as e:
+        metrics.record_error()
         error_msg = f"Error in SQL retriever agent: {str(e)}"
         return {**state, "context_docs": error_msg, "sql_query": None}
 
+def _cacheable(sql_query: str) -> bool:
+    # Placeholder queries standing in for a failed generation are not worth reusing
+    return not sql_query.startswith("SELECT 'Generated query is not a valid SELECT statement") and \
+        "Insufficient schema information" not in sql_query
+
 def generate_sql_query(user_query: str, schema_info: str) -> str:
     """
     Generate SQL query based on user question and schema information.
@@ -1,14 +1,24 @@
 from state import DataState
 from tools.llm import get_llm
+from agents.router import router
 
 def supervisor_agent(state: DataState):
     user_query = state["user_query"]
-    
-    # Check if we're dealing with DB data (check data_items for schema type)
     data_items = state.get("data_items", [])
-    has_schema_data = any(item.get("type") == "schema" for item in data_items)
-    has_pdf_data = any(item.get("type") in ["text", "table", "image"] for item in data_items)
-    
+
+    # The LLM is only asked when the loaded data and the query leave the route open
+    next_agent = router.route(
+        user_query,
+        data_items,
+        lambda has_schema_data, has_pdf_data: llm_route(user_query, has_schema_data, has_pdf_data),
+        index=state.get("pdf_index")
+    )
+    return {**state, "next": next_agent}
+
+def llm_route(user_query: str, has_schema_data: bool, has_pdf_data: bool) -> str:
+    """
+    Ask the LLM which agent should handle the query.
+    """
     supervisor_prompt = f"""
     You are a supervisor agent responsible for routing user queries in a multimodal system.
     Your job:
@@ -75,4 +85,4 @@ def supervisor_agent(state: DataState):
             # Default fallback
             next_agent = "retriever_agent"
     
-    return {**state, "next": next_agent}
\ No newline at end of file
+    return next_agent
\ No newline at end of file
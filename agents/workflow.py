@@ -1,19 +1,24 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from state import DataState
 from agents.supervisor import supervisor_agent
 from agents.presenter import presenter_agent
 from agents.retriever import retriever_agent
 from agents.sql_retriever import sql_retriever_agent
 from agents.sql_executor import sql_executor_agent
+from agents.speculation import (should_speculate, start_speculation, speculative_branch, speculative_supervisor,
+                                join_speculation, route_after_speculation)
+from tools.metrics import metrics
 
 def create_workflow():
     workflow = StateGraph(DataState)
 
-    workflow.add_node("supervisor_agent", supervisor_agent)
-    workflow.add_node("retriever_agent", retriever_agent)
-    workflow.add_node("sql_retriever_agent", sql_retriever_agent)
-    workflow.add_node("sql_executor_agent", sql_executor_agent)
-    workflow.add_node("presenter_agent", presenter_agent)
+    # Every node records its calls, errors and latency (served at /metrics)
+
+    workflow.add_node("supervisor_agent", metrics.instrument_node("supervisor_agent", supervisor_agent))
+    workflow.add_node("retriever_agent", metrics.instrument_node("retriever_agent", retriever_agent))
+    workflow.add_node("sql_retriever_agent", metrics.instrument_node("sql_retriever_agent", sql_retriever_agent))
+    workflow.add_node("sql_executor_agent", metrics.instrument_node("sql_executor_agent", sql_executor_agent))
+    workflow.add_node("presenter_agent", metrics.instrument_node("presenter_agent", presenter_agent))
 
     def route_supervisor(state: DataState):
         next_agent = state.get("next", "retriever_agent")
@@ -42,5 +47,38 @@ def create_workflow():
     workflow.add_edge("sql_executor_agent", "presenter_agent")
     workflow.add_edge("presenter_agent", END)
 
-    workflow.set_entry_point("supervisor_agent")
+    # Speculative mode: with PDF and database data both loaded, both retrievers start
+    # alongside the supervisor; the chosen branch's output goes on, the other is dropped
+    workflow.add_node("start_speculation", start_speculation)
+    workflow.add_node("speculative_supervisor_agent",
+                      metrics.instrument_node("speculative_supervisor_agent", speculative_supervisor(supervisor_agent)))
+    for branch, agent in [("retriever_agent", retriever_agent), ("sql_retriever_agent", sql_retriever_agent)]:
+        workflow.add_node(f"speculative_{branch}",
+                          metrics.instrument_node(f"speculative_{branch}", speculative_branch(branch, agent)))
+    workflow.add_node("join_speculation", join_speculation)
+
+    workflow.add_edge("start_speculation", "speculative_supervisor_agent")
+    workflow.add_edge("start_speculation", "speculative_retriever_agent")
+    workflow.add_edge("start_speculation", "speculative_sql_retriever_agent")
+    workflow.add_edge(["speculative_supervisor_agent", "speculative_retriever_agent", "speculative_sql_retriever_agent"],
+                      "join_speculation")
+    workflow.add_conditional_edges(
+        "join_speculation",
+        route_after_speculation,
+        {
+            "retriever_agent": "retriever_agent",
+            "sql_retriever_agent": "sql_retriever_agent",
+            "sql_executor_agent": "sql_executor_agent",
+            "presenter_agent": "presenter_agent"
+        }
+    )
+
+    workflow.add_conditional_edges(
+        START,
+        lambda state: "start_speculation" if should_speculate(state) else "supervisor_agent",
+        {
+            "start_speculation": "start_speculation",
+            "supervisor_agent": "supervisor_agent"
+        }
+    )
     return workflow.compile()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
@@ -7,6 +7,9 @@ import tempfile
 import shutil
 import traceback
 import time
+import hashlib
+from tools.metrics import metrics
+from tools.answer_cache import answer_cache, ANSWER_CACHE
 
 app = FastAPI(title="Multimodal RAG API", version="1.0.0")
 
@@ -20,7 +23,9 @@ app.add_middleware(
 )
 
 # Global variables
-processed_data = []
+processed_data = []  # Items of the loaded PDF and of the loaded database's schema
+pdf_index = None  # Vector index handle of the loaded PDF
+db_index = None  # Vector index handle of the loaded database's schema
 current_workflow = None
 temp_db_files = []
 
@@ -31,10 +36,15 @@ os.makedirs("temp_dbs", exist_ok=True)
 
 class QueryRequest(BaseModel):
     query: str
+    retrieval_mode: Optional[str] = None  # "lexical", "vector" or "hybrid"
+    include_timings: bool = False  # Return the per-node and per-stage timing breakdown
+    use_cache: bool = True  # Allow an answer cached for the same or a similar question
 
 class QueryResponse(BaseModel):
     answer: str
     context: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+    cached: bool = False
 
 class FileUploadResponse(BaseModel):
     message: str
@@ -45,12 +55,19 @@ class FileUploadResponse(BaseModel):
 async def root():
     return {"message": "Multimodal RAG API is running!"}
 
+def replace_source_items(items: List[Dict[str, Any]], schema: bool) -> List[Dict[str, Any]]:
+    """
+    Swap in the items of one kind of source (a database schema or a PDF), keeping the other kind loaded.
+    """
+    return [item for item in processed_data if (item.get("type") == "schema") != schema] + items
+
 @app.post("/upload/", response_model=FileUploadResponse)
 async def upload_file(file: UploadFile = File(...)):
     """
-    Upload and process PDF or DB files
+    Upload and process PDF or DB files. A PDF replaces the loaded PDF and a DB
+    file the loaded database; one of each can be loaded and queried together.
     """
-    global processed_data, current_workflow
+    global processed_data, pdf_index, db_index, current_workflow
     
     try:
         # Create uploads directory if it doesn't exist
@@ -67,10 +84,12 @@ async def upload_file(file: UploadFile = File(...)):
         if file_extension == '.pdf':
             print("Processing PDF file...")
             try:
-                from handle_docs.handler import pdf_handler
-                initial_data_state: List[Dict[str, Any]] = []
-                processed_data = pdf_handler(filePath=temp_file_path, dataState=initial_data_state)
-                print(f"Processed {len(processed_data)} PDF data items")
+                from handle_docs.handler import ingest_pdf
+                # Extract, embed and index in one streaming pass so queries only need to embed the question
+                items, pdf_index = ingest_pdf(filePath=temp_file_path, document_name=file.filename)
+                processed_data = replace_source_items(items, schema=False)
+                print(f"Processed {len(items)} PDF data items")
+                print(f"Indexed {pdf_index['count']} items into {pdf_index['collection']}")
                 file_type = "PDF"
                 
                 # Clean up temp file immediately for PDF
@@ -92,7 +111,7 @@ async def upload_file(file: UploadFile = File(...)):
         elif file_extension == '.db':
             print("Processing DB file...")
             try:
-                from handle_sql.handler_sql import db_handler
+                from handle_sql.handler_sql import ingest_db
                 from database_mcp.client import mcp_client  # Fixed import path
                 
                 # For DB files, we need to keep the file accessible
@@ -105,8 +124,9 @@ async def upload_file(file: UploadFile = File(...)):
                 
                 # Set database path for MCP client
                 mcp_client.set_database_path(db_file_path)
-                processed_data = db_handler(filePath=db_file_path)
-                print(f"Processed DB file with {len(processed_data)} schema chunks")
+                items, db_index = ingest_db(filePath=db_file_path, source_name=file.filename)
+                processed_data = replace_source_items(items, schema=True)
+                print(f"Processed DB file with {len(items)} schema chunks")
                 file_type = "Database"
                 
                 # Keep track of DB file for later cleanup
@@ -131,6 +151,9 @@ async def upload_file(file: UploadFile = File(...)):
                 pass
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
         
+        # Answers about the previous data no longer apply
+        answer_cache.clear()
+        
         # Create workflow
         try:
             from agents.workflow import create_workflow
@@ -143,7 +166,7 @@ async def upload_file(file: UploadFile = File(...)):
         return FileUploadResponse(
             message=f"Successfully processed {file.filename}",
             file_type=file_type,
-            data_items_count=len(processed_data)
+            data_items_count=len(items)
         )
         
     except HTTPException:
@@ -154,6 +177,29 @@ async def upload_file(file: UploadFile = File(...)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+def answer_cache_version(retrieval_mode: Optional[str]) -> str:
+    """
+    Version of the loaded data that cached answers are keyed by: the PDF and
+    database index fingerprints (a hash of the schema if it was not indexed),
+    plus the retrieval mode.
+    """
+    pdf_version = pdf_index.get("fingerprint", "") if pdf_index else ""
+    if db_index and db_index.get("fingerprint"):
+        db_version = db_index["fingerprint"]
+    else:
+        schema = "\n".join(item.get("text", "") for item in processed_data if item.get("type") == "schema")
+        db_version = hashlib.sha256(schema.encode("utf-8")).hexdigest() if schema else ""
+    return f"{pdf_version}:{db_version}:{retrieval_mode or ''}"
+
+def sql_cached(query: str) -> bool:
+    """
+    Whether SQL generated before for this question against the loaded schema is cached.
+    """
+    from tools.sql_cache import sql_cache, schema_hash
+    from tools.llm import LLM_MODEL
+    schema_texts = [item.get("text", "") for item in processed_data if item.get("type") == "schema" and item.get("text")]
+    return bool(schema_texts) and sql_cache.contains(query, schema_hash(schema_texts), LLM_MODEL)
+
 @app.post("/query/", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
     """
@@ -165,22 +211,48 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=400, detail="No file has been processed yet. Please upload a file first.")
     
     try:
-        # Run workflow
-        result = current_workflow.invoke({
-            "user_query": request.query,
-            "context_docs": "",
-            "final_answer": "",
-            "next": None,
-            "data_items": processed_data,
-            "sql_query": None
-        })
-        
-        final_answer = result.get("final_answer", "No answer generated")
-        context_docs = result.get("context_docs", "")
+        with metrics.track_request() as timings:
+            use_cache = ANSWER_CACHE and request.use_cache
+            cached = None
+            if use_cache:
+                version = answer_cache_version(request.retrieval_mode)
+                query_embedding = None
+                cached = answer_cache.get_exact(version, request.query)
+                # Lexical mode makes no remote calls, so it only reuses answers to the same question.
+                # Questions with cached SQL are answered from fresh query results without an embedding here
+                if cached is None and request.retrieval_mode != "lexical" and not sql_cached(request.query):
+                    from tools.embeddings import generate_multimodal_embeddings
+                    # The workflow embeds the same query again, which the embedding cache serves
+                    query_embedding = generate_multimodal_embeddings(prompt=request.query)
+                    cached = answer_cache.get_similar(version, request.query, query_embedding)
+            
+            if cached is not None:
+                final_answer, context_docs = cached["final_answer"], cached["context_docs"]
+            else:
+                # Run workflow
+                result = current_workflow.invoke({
+                    "user_query": request.query,
+                    "context_docs": "",
+                    "final_answer": "",
+                    "next": None,
+                    "data_items": processed_data,
+                    "sql_query": None,
+                    "pdf_index": pdf_index,
+                    "db_index": db_index,
+                    "retrieval_mode": request.retrieval_mode
+                })
+                
+                final_answer = result.get("final_answer", "No answer generated")
+                context_docs = result.get("context_docs", "")
+                if use_cache and final_answer and not final_answer.startswith("Error"):
+                    answer_cache.put(version, request.query, query_embedding,
+                                     {"final_answer": final_answer, "context_docs": context_docs})
         
         return QueryResponse(
             answer=final_answer,
-            context=context_docs
+            context=context_docs,
+            timings=timings if request.include_timings else None,
+            cached=cached is not None
         )
         
     except Exception as e:
@@ -188,6 +260,82 @@ async def query_documents(request: QueryRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@app.get("/pages/{page_num}/image")
+async def get_page_image(page_num: int, dpi: Optional[int] = None, format: Optional[str] = None):
+    """
+    Render a page of the uploaded PDF on demand (e.g. for a UI preview)
+    """
+    from handle_docs.pages import page_image, PAGE_RENDER_DPI, PAGE_RENDER_FORMAT, \
+        PAGE_RENDER_MIN_DPI, PAGE_RENDER_MAX_DPI, PAGE_RENDER_FORMATS
+    
+    fmt = (format or PAGE_RENDER_FORMAT).lower()
+    if fmt not in PAGE_RENDER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {format} (expected one of {PAGE_RENDER_FORMATS})")
+    dpi = min(max(dpi or PAGE_RENDER_DPI, PAGE_RENDER_MIN_DPI), PAGE_RENDER_MAX_DPI)
+    
+    page_item = next((item for item in processed_data if item.get("type") == "page" and item.get("page") == page_num), None)
+    if page_item is None:
+        raise HTTPException(status_code=404, detail=f"Page {page_num} not found in the processed document")
+    
+    try:
+        image_bytes = page_image(page_item, dpi=dpi, fmt=fmt)
+    except Exception as e:
+        print(f"Page render error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error rendering page: {str(e)}")
+    
+    return Response(content=image_bytes, media_type=f"image/{fmt}")
+
+@app.get("/documents/")
+async def list_documents():
+    """
+    List the indexed sources (one namespace per PDF or database)
+    """
+    from tools.vector_index import list_namespaces
+    return {"documents": list_namespaces()}
+
+@app.delete("/documents/{document_name}")
+async def delete_document(document_name: str, source_type: Optional[str] = None):
+    """
+    Delete an ingested source: a PDF's vectors, manifest and unreferenced blobs,
+    or a database's schema vectors. source_type ("pdf" or "sql") picks one when
+    both share the name; by default both are deleted.
+    """
+    global processed_data, pdf_index, db_index, current_workflow
+    from handle_docs.handler import delete_document as delete_pdf_document
+    from handle_sql.handler_sql import delete_db
+    from tools.vector_index import namespace_name
+    
+    if source_type not in [None, "pdf", "sql"]:
+        raise HTTPException(status_code=400, detail=f"Unknown source type: {source_type} (expected pdf or sql)")
+    deleted_types = []
+    if source_type in [None, "pdf"] and delete_pdf_document(document_name):
+        deleted_types.append("pdf")
+    if source_type in [None, "sql"] and delete_db(document_name):
+        deleted_types.append("sql")
+    if not deleted_types:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_name}")
+    
+    answer_cache.clear()
+    
+    # Forget the loaded source if it was the one deleted, keeping the other kind loaded
+    if pdf_index and "pdf" in deleted_types and pdf_index.get("collection") == namespace_name("pdf", document_name):
+        processed_data = replace_source_items([], schema=False)
+        pdf_index = None
+    if db_index and "sql" in deleted_types and db_index.get("collection") == namespace_name("sql", document_name):
+        processed_data = replace_source_items([], schema=True)
+        db_index = None
+    if not processed_data:
+        current_workflow = None
+    
+    return {"message": f"Deleted {document_name}"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Workflow node and stage metrics in the Prometheus text format
+    """
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health/")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,115 @@
+"""
+Compare per-page LangChain splitting with the document-level streaming chunker.
+
+Two fixtures: the PDF repeated --copies times, and a generated document whose
+paragraphs run on across page breaks (--pages pages), which is where per-page
+splitting leaves page-tail fragments. Text extraction is timed separately from
+chunking, with the strategies interleaved so both see the same cache state.
+The chunk counts show how many embedding calls each strategy needs, and
+fragments counts chunks that add fewer than FRAGMENT_CHARS characters to the
+chunk before them.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_chunker [path/to/file.pdf] [--copies 20] [--pages 100] [--repeat 5]
+"""
+import argparse
+import statistics
+import time
+import pymupdf
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from handle_docs.text_chunks import DocumentChunker, page_blocks, CHUNK_SIZE, CHUNK_OVERLAP
+
+# Chunks adding fewer new characters than this (beyond their overlap with the previous chunk) are fragments
+FRAGMENT_CHARS = 200
+
+def build_document(filepath, copies: int):
+    doc = pymupdf.open()
+    with pymupdf.open(filepath) as source:
+        for _ in range(copies):
+            doc.insert_pdf(source)
+    return doc
+
+def build_flowing_document(pages: int, lines_per_page: int = 28, line_chars: int = 95):
+    """
+    Paragraphs of distinct sentences laid out line by line, continuing across page breaks.
+    """
+    words = []
+    for i in range(pages * lines_per_page * 2):
+        words.extend(f"Sentence {i} reports that measurement {i * 7 % 101} improved step {i % 13} of the run.".split())
+    doc = pymupdf.open()
+    page, line, text = None, 0, ""
+    for word in words:
+        if len(text) + len(word) + 1 <= line_chars:
+            text = f"{text} {word}".strip()
+            continue
+        if page is None or line == lines_per_page:
+            if page is not None and len(doc) == pages:
+                break
+            page, line = doc.new_page(), 0
+        # A blank line every 9 lines starts a new paragraph (layout block)
+        y = 60 + line * 16 + (line // 9) * 10
+        page.insert_text((50, y), text, fontsize=9)
+        line, text = line + 1, word
+    return doc
+
+def fragments(chunks) -> int:
+    count = 0
+    for previous, chunk in zip([""] + chunks, chunks):
+        shared = next((k for k in range(min(len(previous), len(chunk)), 0, -1) if previous.endswith(chunk[:k])), 0)
+        count += len(chunk) - shared < FRAGMENT_CHARS
+    return count
+
+def run_langchain(doc):
+    start = time.perf_counter()
+    texts = [page.get_text() for page in doc]
+    extracted = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, length_function=len)
+    chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+    return extracted - start, time.perf_counter() - extracted, chunks
+
+def run_document_chunker(doc):
+    start = time.perf_counter()
+    blocks = [page_blocks(page) for page in doc]
+    extracted = time.perf_counter()
+    chunker = DocumentChunker()
+    items = [item for page_num, page in enumerate(blocks) for item in chunker.feed(page_num, [block[4] for block in page])]
+    items += chunker.flush()
+    return extracted - start, time.perf_counter() - extracted, [item["text"] for item in items]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text chunking strategies")
+    parser.add_argument("pdf", nargs="?", default="attention.pdf")
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=100, help="pages of the generated run-on fixture")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fixtures = [
+        (f"{args.pdf} x{args.copies}", build_document(args.pdf, args.copies)),
+        ("run-on paragraphs", build_flowing_document(args.pages)),
+    ]
+    cases = [
+        ("langchain, per page", run_langchain),
+        ("document chunker, blocks", run_document_chunker),
+    ]
+
+    print(f"chunk_size={CHUNK_SIZE}, chunk_overlap={CHUNK_OVERLAP}; extract and chunk times are min / median")
+    print(f"{'fixture':<22} {'strategy':<28} {'extract (s)':>14} {'chunk (s)':>14} {'chunks':>7} {'avg chars':>10} {'fragments':>10}")
+    for fixture, doc in fixtures:
+        times = {name: ([], []) for name, _ in cases}
+        results = {}
+        for _ in range(args.repeat):
+            for name, run in cases:
+                extract_time, chunk_time, results[name] = run(doc)
+                times[name][0].append(extract_time)
+                times[name][1].append(chunk_time)
+        for name, _ in cases:
+            chunks = results[name]
+            extract_times, chunk_times = times[name]
+            average = sum(len(chunk) for chunk in chunks) / max(1, len(chunks))
+            print(f"{fixture[:22]:<22} {name:<28} {min(extract_times):>6.3f} / {statistics.median(extract_times):<5.3f} "
+                  f"{min(chunk_times):>6.3f} / {statistics.median(chunk_times):<5.3f} {len(chunks):>7} "
+                  f"{average:>10.0f} {fragments(chunks):>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Ingestion benchmark suite: PDF and SQLite ingestion throughput and per-stage cost.
+
+Fixtures are attention.pdf, a large generated PDF whose pages all differ (text,
+a ruled table on every third page and an image each), and a generated SQLite
+database with many linked tables. Copies of one PDF would not do for the large
+fixture: deduplication folds repeated chunks and images, so embedding and upsert
+would not grow with its size. Embeddings come from the
+deterministic local hashing provider and all stores live in a temporary
+directory, so runs need no network and leave ./data untouched.
+
+For each fixture the suite reports ingest wall time, pages/sec, time per stage
+(tables, text, images, pages, page_render, embedding, upsert, and schema for
+databases), the tracemalloc peak, max RSS and item counts per type. The
+tracemalloc peak covers the Python heap only; native memory (MuPDF, NumPy
+buffers) shows up in max RSS, the process peak up to the end of the fixture. Stages
+overlap, because extraction runs ahead of embedding in a separate thread.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ingest [--pages 150] [--tables 300] [--repeat 3] [--output results.json]
+    python -m benchmarks.bench_ingest --baseline results.json [--tolerance 0.25]
+
+With --baseline, the run fails (exit code 1) when a timing, the tracemalloc
+peak or max RSS grows by more than the tolerance, or when item counts change.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+# Configure the stores before any project module reads its settings
+WORK_DIR = tempfile.mkdtemp(prefix="bench_ingest_")
+os.environ["EMBEDDING_PROVIDER"] = "hashing"
+os.environ["EMBEDDING_CACHE_MAX_MB"] = "0"
+os.environ["CASSETTE_MODE"] = "off"
+for variable, name in [("CHROMA_DIR", "chroma"), ("BLOB_STORE_DIR", "blobs"), ("MANIFEST_DIR", "manifests"),
+                       ("LOCAL_INDEX_DIR", "local_index"), ("EMBEDDING_CACHE_DIR", "embedding_cache"),
+                       ("INGEST_TRACE_DIR", "traces")]:
+    os.environ[variable] = os.path.join(WORK_DIR, name)
+
+import numpy as np
+import pymupdf
+import handle_docs.handler as pdf_handler_module
+from handle_docs.handler import ingest_pdf
+from handle_docs.pages import render_page
+from handle_docs.text_chunks import DocumentChunker
+from handle_sql.handler_sql import schema_items
+from tools.embedding_engine import embedding_engine
+from tools.local_index import LocalIndex
+from tools.vector_index import build_schema_index
+
+# Timings below this many seconds never count as regressions (noise floor)
+MIN_REGRESSION_SECONDS = 0.05
+
+class StageTimer:
+    """
+    Accumulates wall time per stage from wrapped functions, across threads.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.seconds.clear()
+
+    def wrap(self, stage: str, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - start
+        return timed
+
+def instrument(timer: StageTimer):
+    import chromadb.api.models.Collection as chroma_collection
+    handler = pdf_handler_module
+    handler.process_tables = timer.wrap("tables", handler.process_tables)
+    handler.page_blocks = timer.wrap("text", handler.page_blocks)
+    DocumentChunker.feed = timer.wrap("text", DocumentChunker.feed)
+    handler.process_images = timer.wrap("images", handler.process_images)
+    handler.process_page_images = timer.wrap("pages", handler.process_page_images)
+    embedding_engine.embed_many = timer.wrap("embedding", embedding_engine.embed_many)
+    chroma_collection.Collection.upsert = timer.wrap("upsert", chroma_collection.Collection.upsert)
+    LocalIndex.upsert = timer.wrap("upsert", LocalIndex.upsert)
+
+def make_large_pdf(pages: int, path: str, lines: int = 30, table_every: int = 3) -> str:
+    """
+    Pages of distinct sentences, each with a distinct image, and a ruled table of distinct figures every few pages.
+    """
+    rng = np.random.default_rng(0)
+    with pymupdf.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            for line in range(lines):
+                i = page_num * lines + line
+                page.insert_text((50, 60 + line * 14), f"Run {i} measured {i * 7 % 101} units at step {i % 13} "
+                                 f"of trial {page_num}, against {i * 31 % 997} expected.", fontsize=9)
+            pixels = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+            page.insert_image(pymupdf.Rect(400, 500, 528, 628),
+                              pixmap=pymupdf.Pixmap(pymupdf.csRGB, 64, 64, pixels.tobytes(), 0))
+            if page_num % table_every == 0:
+                xs = [50 + 80 * column for column in range(4)]
+                ys = [500 + 20 * row for row in range(5)]
+                for x in xs:
+                    page.draw_line((x, ys[0]), (x, ys[-1]))
+                for y in ys:
+                    page.draw_line((xs[0], y), (xs[-1], y))
+                for row in range(4):
+                    for column in range(3):
+                        page.insert_text((xs[column] + 4, ys[row] + 14), f"{page_num}.{row}.{column}", fontsize=9)
+        doc.save(path)
+    return path
+
+def make_database(num_tables: int, path: str, group_size: int = 5, rows: int = 20) -> str:
+    """
+    Tables come in groups linked by foreign keys, so schema chunking has work to do.
+    """
+    conn = sqlite3.connect(path)
+    for i in range(num_tables):
+        parent = i - 1 if i % group_size else None
+        columns = [f"id INTEGER PRIMARY KEY", f"name_{i} TEXT", f"amount_{i} REAL", f"created_{i} TEXT",
+                   f"status_{i} TEXT"]
+        if parent is not None:
+            columns.append(f"parent_id INTEGER REFERENCES table_{parent}(id)")
+        conn.execute(f"CREATE TABLE table_{i} ({', '.join(columns)})")
+        values = [(row, f"name {row}", row * 1.5, "2024-01-01", "active") for row in range(rows)]
+        conn.executemany(f"INSERT INTO table_{i} (id, name_{i}, amount_{i}, created_{i}, status_{i}) VALUES (?, ?, ?, ?, ?)",
+                         values)
+    conn.commit()
+    conn.close()
+    return path
+
+def run_pdf(path: str, run_name: str, timer: StageTimer):
+    data_items, index = ingest_pdf(path, workers=1, document_name=run_name)
+    # Pages are rendered on demand; time one uncached render per page
+    render_page.cache_clear()
+    doc_refs = {item["page"]: item["doc_ref"] for item in data_items if item.get("type") == "page"}
+    start = time.perf_counter()
+    for page_num, doc_ref in doc_refs.items():
+        render_page(doc_ref, page_num)
+    timer.seconds["page_render"] += time.perf_counter() - start
+    with pymupdf.open(path) as doc:
+        pages = len(doc)
+    return data_items, pages
+
+def run_db(path: str, run_name: str, timer: StageTimer):
+    start = time.perf_counter()
+    data_items = schema_items(path, run_name)
+    timer.seconds["schema"] += time.perf_counter() - start
+    build_schema_index(data_items, run_name)
+    return data_items, 0
+
+def measure(name: str, run, path: str, repeat: int, timer: StageTimer):
+    best = None
+    for attempt in range(repeat + 1):
+        traced = attempt == repeat
+        timer.reset()
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        data_items, pages = run(path, f"{name}-{attempt}", timer)
+        # On-demand page renders are reported as a stage, not as ingest time
+        seconds = time.perf_counter() - start - timer.seconds.get("page_render", 0.0)
+        if traced:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            best["peak_tracemalloc_mb"] = round(peak / (1024 * 1024), 2)
+            break
+        if best is None or seconds < best["seconds"]:
+            best = {
+                "seconds": round(seconds, 4),
+                "pages": pages,
+                "pages_per_sec": round(pages / seconds, 2) if pages else None,
+                "stages": {stage: round(value, 4) for stage, value in sorted(timer.seconds.items())},
+                "items": dict(sorted(Counter(item.get("type") for item in data_items).items()))
+            }
+    # ru_maxrss is in kilobytes on Linux
+    best["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return best
+
+def compare(results, baseline, tolerance: float):
+    failures = []
+    for name, current in results["fixtures"].items():
+        previous = baseline.get("fixtures", {}).get(name)
+        if previous is None:
+            continue
+        timings = [("seconds", current["seconds"], previous["seconds"])]
+        timings += [(f"stages.{stage}", value, previous.get("stages", {}).get(stage))
+                    for stage, value in current["stages"].items()]
+        for metric, value, old in timings:
+            if old is not None and value - old > MIN_REGRESSION_SECONDS and value > old * (1 + tolerance):
+                failures.append(f"{name} {metric}: {old:.3f}s -> {value:.3f}s")
+        for metric in ["peak_tracemalloc_mb", "max_rss_mb"]:
+            old_peak = previous.get(metric)
+            if old_peak and current[metric] > old_peak * (1 + tolerance):
+                failures.append(f"{name} {metric}: {old_peak} -> {current[metric]}")
+        if current["items"] != previous.get("items"):
+            failures.append(f"{name} items: {previous.get('items')} -> {current['items']}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF and database ingestion")
+    parser.add_argument("--pdf", default="attention.pdf")
+    parser.add_argument("--pages", type=int, default=150, help="pages in the generated large PDF")
+    parser.add_argument("--tables", type=int, default=300, help="tables in the generated database")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per fixture (best is kept)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    instrument(timer)
+    try:
+        fixtures = [
+            ("attention_pdf", run_pdf, args.pdf),
+            ("large_pdf", run_pdf, make_large_pdf(args.pages, os.path.join(WORK_DIR, "large.pdf"))),
+            ("many_tables_db", run_db, make_database(args.tables, os.path.join(WORK_DIR, "many_tables.db"))),
+        ]
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "embedding_model": embedding_engine.model_id,
+                "pages": args.pages,
+                "tables": args.tables,
+                "repeat": args.repeat
+            },
+            "fixtures": {}
+        }
+        for name, run, path in fixtures:
+            result = measure(name, run, path, args.repeat, timer)
+            results["fixtures"][name] = result
+            stages = ", ".join(f"{stage} {value:.2f}s" for stage, value in result["stages"].items())
+            rate = f"{result['pages_per_sec']} pages/s, " if result["pages_per_sec"] else ""
+            print(f"{name}: {result['seconds']:.2f}s, {rate}peak {result['peak_tracemalloc_mb']} MB, "
+                  f"items {result['items']}")
+            print(f"    {stages}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
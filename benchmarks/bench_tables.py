@@ -0,0 +1,54 @@
+"""
+Compare table extraction strategies on a PDF.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_tables [path/to/file.pdf] [--repeat N]
+"""
+import argparse
+import time
+import pdfplumber
+import pymupdf
+from handle_docs.tables import TableExtractor
+
+def run_reopen_per_page(filepath) -> int:
+    # Previous behaviour: reopen the PDF with pdfplumber for every page
+    with pymupdf.open(filepath) as doc:
+        num_pages = len(doc)
+    found = 0
+    for page_num in range(num_pages):
+        with pdfplumber.open(filepath) as pdf:
+            found += len(pdf.pages[page_num].extract_tables())
+    return found
+
+def run_extractor(filepath, backend: str, prefilter: bool) -> int:
+    found = 0
+    with TableExtractor(filepath, backend=backend, prefilter=prefilter) as extractor:
+        for page_num in range(len(extractor._doc)):
+            found += len(extractor.extract(page_num))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark table extraction backends")
+    parser.add_argument("pdf", nargs="?", default="attention.pdf")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        ("pdfplumber, reopen per page", lambda: run_reopen_per_page(args.pdf)),
+        ("pdfplumber, single open", lambda: run_extractor(args.pdf, "pdfplumber", prefilter=False)),
+        ("pdfplumber, single open + prefilter", lambda: run_extractor(args.pdf, "pdfplumber", prefilter=True)),
+        ("pymupdf find_tables", lambda: run_extractor(args.pdf, "pymupdf", prefilter=False)),
+        ("pymupdf find_tables + prefilter", lambda: run_extractor(args.pdf, "pymupdf", prefilter=True)),
+    ]
+
+    print(f"{'strategy':<40} {'best (s)':>10} {'tables':>8}")
+    for name, run in cases:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            found = run()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<40} {min(timings):>10.3f} {found:>8}")
+
+if __name__ == "__main__":
+    main()
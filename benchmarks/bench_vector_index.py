@@ -0,0 +1,108 @@
+"""
+Compare the local NumPy vector index against Chroma on random vectors.
+
+Indexes are built in upserts of INGEST_BATCH_SIZE vectors, the way ingestion
+writes them. Reports build time, open (load) time, batched query latency, resident memory
+of the reopened index while querying, and recall@k against exact float32 search.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_vector_index [--sizes 1000,10000,100000] [--dim 1024] [--queries 100] [--k 10]
+                                            [--batch-size 64] [--no-chroma]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from tools.local_index import LocalIndex, QUANTIZATIONS
+from tools.vector_index import INGEST_BATCH_SIZE
+
+def rss_mb() -> float:
+    # Current resident set size (Linux)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normalized.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def recall(found, expected) -> float:
+    hits = sum(len(set(row) & set(truth)) for row, truth in zip(found, expected))
+    return hits / float(expected.size)
+
+def bench_local(root, vectors, queries, k, quantization, ids, batch_size):
+    start = time.perf_counter()
+    index = LocalIndex(f"bench_{quantization}", quantization=quantization, root=root)
+    for offset in range(0, len(ids), batch_size):
+        index.upsert(ids=ids[offset:offset + batch_size], embeddings=vectors[offset:offset + batch_size])
+    build = time.perf_counter() - start
+
+    del index
+
+    before = rss_mb()
+    start = time.perf_counter()
+    index = LocalIndex(f"bench_{quantization}", quantization=quantization, root=root)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = index.query(query_embeddings=queries, n_results=k, include=[])
+    latency = (time.perf_counter() - start) / len(queries)
+    memory = rss_mb() - before
+    found = [[int(item_id) for item_id in row] for row in results["ids"]]
+    return build, load, latency, memory, found
+
+def bench_chroma(root, vectors, queries, k, ids, batch_size):
+    import chromadb
+    client = chromadb.PersistentClient(path=root)
+    start = time.perf_counter()
+    collection = client.create_collection("bench_chroma", metadata={"hnsw:space": "cosine"})
+    for offset in range(0, len(ids), batch_size):
+        collection.add(ids=ids[offset:offset + batch_size], embeddings=vectors[offset:offset + batch_size])
+    build = time.perf_counter() - start
+
+    del collection, client
+
+    before = rss_mb()
+    start = time.perf_counter()
+    collection = chromadb.PersistentClient(path=root).get_collection("bench_chroma")
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = collection.query(query_embeddings=queries, n_results=k, include=[])
+    latency = (time.perf_counter() - start) / len(queries)
+    memory = rss_mb() - before
+    found = [[int(item_id) for item_id in row] for row in results["ids"]]
+    return build, load, latency, memory, found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local vector index vs Chroma")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="vectors per upsert")
+    parser.add_argument("--no-chroma", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>8} {'backend':<16} {'build (s)':>10} {'open (ms)':>10} {'query (ms)':>11} {'rss +MB':>9} {'recall':>7}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        expected = exact_top_k(vectors, queries, args.k)
+        ids = [str(i) for i in range(size)]
+
+        cases = [(f"local {q}", lambda root, q=q: bench_local(root, vectors, queries, args.k, q, ids, args.batch_size)) for q in QUANTIZATIONS]
+        if not args.no_chroma:
+            cases.append(("chroma hnsw", lambda root: bench_chroma(root, vectors, queries, args.k, ids, args.batch_size)))
+
+        for name, run in cases:
+            with tempfile.TemporaryDirectory() as root:
+                build, load, latency, memory, found = run(root)
+            print(f"{size:>8} {name:<16} {build:>10.2f} {load * 1000:>10.1f} {latency * 1000:>11.3f} "
+                  f"{memory:>9.1f} {recall(found, expected):>7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Time end-to-end workflow runs (supervisor -> retriever -> presenter) on a PDF.
+
+Record the LLM and embedding calls once against the live services, then
+replay them so timings only reflect our own code:
+
+    CASSETTE_MODE=record python -m benchmarks.bench_workflow
+    CASSETTE_MODE=replay CASSETTE_LATENCY=none python -m benchmarks.bench_workflow --repeat 5
+
+CASSETTE_LATENCY=recorded replays the captured service latency instead.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_workflow [path/to/file.pdf] [--repeat N]
+"""
+import argparse
+import statistics
+import time
+from agents.workflow import create_workflow
+from handle_docs.handler import ingest_pdf
+from tools.cassette import cassette
+
+QUERIES = [
+    "What is the transformer architecture in the paper?",
+    "What BLEU score does the big model reach on English-to-German?",
+    "How is multi-head attention computed?",
+    "Which optimizer and learning rate schedule were used?",
+    "What is the role of positional encoding?",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end workflow runs")
+    parser.add_argument("pdf", nargs="?", default="attention.pdf")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data_items, index = ingest_pdf(args.pdf)
+    print(f"ingest: {time.perf_counter() - start:.2f}s, cassette mode: {cassette.mode}")
+
+    workflow = create_workflow()
+    print(f"{'query':<64} {'median (ms)':>12} {'min (ms)':>10}")
+    totals = []
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            workflow.invoke({
+                "user_query": query,
+                "context_docs": "",
+                "final_answer": "",
+                "next": None,
+                "data_items": data_items,
+                "sql_query": None,
+                "pdf_index": index,
+                "db_index": None
+            })
+            timings.append(time.perf_counter() - start)
+        totals.extend(timings)
+        print(f"{query[:64]:<64} {statistics.median(timings) * 1000:>12.1f} {min(timings) * 1000:>10.1f}")
+    print(f"{'all queries':<64} {statistics.median(totals) * 1000:>12.1f} {min(totals) * 1000:>10.1f}")
+    if cassette.active:
+        print(f"cassette: {cassette.recorded} recorded, {cassette.replayed} replayed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from typing import List, Dict, Any, Sequence, Set
+import hashlib
+import os
+import re
+import numpy as np
+
+# Set CHUNK_DEDUP=0 to embed every chunk, duplicates included
+CHUNK_DEDUP = os.getenv("CHUNK_DEDUP", "1") != "0"
+# Text chunks whose 64-bit SimHashes differ in at most this many bits are near-duplicates
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3"))
+# A text chunk with at least this share of its distinct words inside a table on the same page repeats the table
+TABLE_CONTAINMENT = float(os.getenv("TABLE_CONTAINMENT", "0.8"))
+# A text block with at least this share of its area inside a table's bounding box is part of the table
+TABLE_BLOCK_OVERLAP = float(os.getenv("TABLE_BLOCK_OVERLAP", "0.5"))
+
+SHINGLE_SIZE = 3
+WORD_PATTERN = re.compile(r"\w+")
+
+def shingles(text: str) -> Set[int]:
+    """
+    Hashes of the word n-grams of a text (the whole text for very short ones).
+    A stable hash is used so worker processes agree with the parent.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little") for gram in grams}
+
+def words(text: str) -> Set[str]:
+    # Tables are read row by row and page text often column by column, so compare bags of words
+    return set(WORD_PATTERN.findall(text.lower()))
+
+def simhash(shingle_set: Set[int]) -> int:
+    if not shingle_set:
+        return 0
+    hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+def overlap(block: Sequence[float], box: Sequence[float]) -> float:
+    """
+    Share of the block's area (x0, y0, x1, y1) that lies inside the box.
+    """
+    width = min(block[2], box[2]) - max(block[0], box[0])
+    height = min(block[3], box[3]) - max(block[1], box[1])
+    area = (block[2] - block[0]) * (block[3] - block[1])
+    if width <= 0 or height <= 0 or area <= 0:
+        return 0.0
+    return width * height / area
+
+class ChunkDeduplicator:
+    """
+    Suppresses redundant text chunks before they are embedded.
+
+    Text blocks lying inside a table extracted from the same page are left out
+    before chunking (table_blocks), since the table item already holds their
+    text. A text chunk is dropped when it near-duplicates an earlier chunk
+    (SimHash over word shingles, looked up by band) or when most of its words
+    come from a table on the same page. Near-duplicates only add their page
+    number to the "pages" list of the first occurrence, like repeated images.
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUP_MAX_DISTANCE, containment: float = TABLE_CONTAINMENT,
+                 block_overlap: float = TABLE_BLOCK_OVERLAP):
+        self.max_distance = max_distance
+        self.containment = containment
+        self.block_overlap = block_overlap
+        # SimHash split into bands for candidate lookup; any match within the distance shares at least one band
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.by_band: List[Dict[int, List[Any]]] = [{} for _ in range(self.bands)]
+        self.tables: Dict[int, List[Set[int]]] = {}
+        self.table_boxes: Dict[int, List[Sequence[float]]] = {}
+        self.near_duplicates = 0
+        self.table_duplicates = 0
+        self.table_blocks = 0
+
+    @property
+    def saved(self) -> int:
+        """
+        Number of chunks (and so embedding calls) suppressed.
+        """
+        return self.near_duplicates + self.table_duplicates
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def add_table(self, item: Dict[str, Any]):
+        self.tables.setdefault(item["page"], []).append(words(item["text"]))
+        if item.get("bbox"):
+            self.table_boxes.setdefault(item["page"], []).append(item["bbox"])
+
+    def outside_tables(self, page_num: int, blocks: List[Sequence[Any]]) -> List[Sequence[Any]]:
+        """
+        Drop the layout blocks (x0, y0, x1, y1, text) of a page that lie inside one of its tables.
+        """
+        boxes = self.table_boxes.get(page_num)
+        if not boxes:
+            return blocks
+        kept = [block for block in blocks if all(overlap(block, box) < self.block_overlap for box in boxes)]
+        self.table_blocks += len(blocks) - len(kept)
+        return kept
+
+    def covered_by_table(self, item: Dict[str, Any]) -> bool:
+        tables = self.tables.get(item["page"])
+        if not tables:
+            return False
+        chunk_words = words(item["text"])
+        for table in tables:
+            if chunk_words and len(chunk_words & table) >= self.containment * len(chunk_words):
+                self.table_duplicates += 1
+                return True
+        return False
+
+    def merge(self, item: Dict[str, Any]) -> bool:
+        """
+        Register a text chunk. Returns False if it near-duplicates one already seen,
+        in which case its page is folded into the existing chunk.
+        """
+        fingerprint = simhash(shingles(item["text"]))
+        keys = self._band_keys(fingerprint)
+        for band, key in enumerate(keys):
+            for other_fingerprint, other in self.by_band[band].get(key, []):
+                if bin(fingerprint ^ other_fingerprint).count("1") <= self.max_distance:
+                    pages = other.setdefault("pages", [other["page"]])
+                    for page_num in item.get("pages", [item["page"]]):
+                        if page_num not in pages:
+                            pages.append(page_num)
+                    self.near_duplicates += 1
+                    return False
+        for band, key in enumerate(keys):
+            self.by_band[band].setdefault(key, []).append((fingerprint, item))
+        return True
+
+    def keep(self, item: Dict[str, Any]) -> bool:
+        """
+        Return True if a freshly extracted text chunk should be kept (and register it).
+        """
+        if self.covered_by_table(item):
+            return False
+        return self.merge(item)
@@ -1,25 +1,321 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 from state import DataState
+import multiprocessing
+import os
 import pymupdf
 from tqdm import tqdm
-from .tables import process_tables
-from .text_chunks import process_text_chunks
-from .images import process_images
+from tools.vector_index import build_index_stream, delete_pages, delete_items, delete_namespace, namespace_name, fingerprint_file, INDEX_VERSION
+from tools.embeddings import item_id
+from tools.embedding_engine import embedding_engine
+from tools.blob_store import blob_store
+from tools.lexical_index import lexical_index_for
+from tools.ingest_trace import span, start_trace, finish_trace, active_trace
+from .tables import process_tables, TableExtractor, TABLE_BACKEND
+from .text_chunks import DocumentChunker, Block, page_blocks, CHUNK_SIZE, CHUNK_OVERLAP
+from .images import process_images, ImageDeduplicator
+from .dedup import ChunkDeduplicator, CHUNK_DEDUP
 from .pages import process_page_images
+from .manifest import load_manifest, save_manifest, delete_manifest, manifest_names, manifest_items, page_hashes, dirty_pages, prune_pages
 
-def pdf_handler(filePath, dataState: List[DataState]) -> List[DataState]:
-    doc = pymupdf.open(filePath)
-    num_pages = len(doc)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=700, chunk_overlap=200, length_function=len)
+# Number of worker processes used to ingest a PDF (1 keeps everything in-process)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
 
-    for page_num in tqdm(range(num_pages)):
-        page = doc[page_num]
-        text = page.get_text()
+# Workers come from a fork server (spawn where there is none): ingestion runs next to the
+# embedding and Chroma threads, and forking a multithreaded process can copy a held lock and deadlock
+PDF_WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
 
-        dataState = process_tables(filepath=filePath, page_num=page_num, dataState=dataState)
-        dataState = process_text_chunks(text=text, text_splitter=text_splitter, page_num=page_num, dataState=dataState)
-        dataState = process_images(page=page, page_num=page_num, dataState=dataState)
-        dataState = process_page_images(page=page, page_num=page_num, dataState=dataState)
+# Shards per worker; more, smaller shards balance uneven pages better
+SHARDS_PER_WORKER = 4
 
-    return dataState
\ No newline at end of file
+# Bump whenever extraction output changes, so previously built indexes are not reused
+EXTRACTOR_VERSION = 5
+
+def _process_page(doc, filePath, page_num, table_extractor, image_dedup, doc_ref) -> Tuple[List[DataState], List[Block]]:
+    """
+    Extract a page's tables, images and page reference, plus its text blocks for the document chunker.
+    """
+    page = doc[page_num]
+    dataState: List[DataState] = []
+    with span("tables", page_num):
+        dataState = process_tables(filepath=filePath, page_num=page_num, dataState=dataState, extractor=table_extractor)
+    with span("images", page_num):
+        dataState = process_images(page=page, page_num=page_num, dataState=dataState, dedup=image_dedup)
+    with span("page_images", page_num):
+        dataState = process_page_images(page=page, page_num=page_num, dataState=dataState, doc_ref=doc_ref)
+    return dataState, _page_blocks(doc, page_num)
+
+def _page_blocks(doc, page_num: int) -> List[Block]:
+    with span("text_blocks", page_num):
+        return page_blocks(doc[page_num])
+
+def _process_pages(filePath, page_nums: List[int], doc_ref: str,
+                   traced: bool = False) -> Tuple[List[Tuple[List[DataState], List[Block]]], List[Dict[str, Any]]]:
+    """
+    Worker entry point: open the document in this process and extract the given pages.
+    Also returns the stage spans recorded here when the parent is tracing.
+    """
+    trace = start_trace(enabled=traced)
+    image_dedup = ImageDeduplicator()
+    with pymupdf.open(filePath) as doc, TableExtractor(filePath, doc=doc) as table_extractor:
+        results = [_process_page(doc, filePath, page_num, table_extractor, image_dedup, doc_ref) for page_num in page_nums]
+    return results, trace.spans if trace else []
+
+def _page_shards(page_nums: List[int], workers: int) -> List[List[int]]:
+    num_shards = min(len(page_nums), workers * SHARDS_PER_WORKER)
+    bounds = [round(i * len(page_nums) / num_shards) for i in range(num_shards + 1)]
+    return [page_nums[bounds[i]:bounds[i + 1]] for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+def iter_pdf_pages(filePath, workers: Optional[int] = None, pages: Optional[List[int]] = None,
+                   image_dedup: Optional[ImageDeduplicator] = None,
+                   chunk_dedup: Optional[ChunkDeduplicator] = None) -> Iterator[List[DataState]]:
+    """
+    Yield extracted items in page order, one page at a time.
+
+    Tables, images and page references come from the pages in pages (all by
+    default). Text is always chunked over the whole document, as one stream of
+    layout blocks, so chunks can span page boundaries; pages outside pages only
+    contribute their blocks, which is cheap. image_dedup and chunk_dedup can be
+    pre-seeded with images and tables that are already known. In parallel mode
+    at most two shards per worker are in flight, so a slow consumer holds back
+    extraction instead of letting results pile up.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    image_dedup = image_dedup if image_dedup is not None else ImageDeduplicator()
+    if chunk_dedup is None and CHUNK_DEDUP:
+        chunk_dedup = ChunkDeduplicator()
+    chunker = DocumentChunker()
+    # Keep a copy of the source so page images can be rendered later on demand
+    doc_ref = blob_store.put_file(filePath)
+
+    def page_items(page_num: int, items: List[DataState], blocks: List[Block]) -> List[DataState]:
+        for item in items:
+            if item.get("type") == "table" and chunk_dedup is not None:
+                # Lets the text that repeats this table be dropped
+                chunk_dedup.add_table(item)
+        with span("text_chunks", page_num):
+            if chunk_dedup is not None:
+                blocks = chunk_dedup.outside_tables(page_num, blocks)
+            chunks = chunker.feed(page_num, [block[4] for block in blocks])
+            return items + [chunk for chunk in chunks if chunk_dedup is None or chunk_dedup.keep(chunk)]
+
+    def flush() -> List[DataState]:
+        return [chunk for chunk in chunker.flush() if chunk_dedup is None or chunk_dedup.keep(chunk)]
+
+    with pymupdf.open(filePath) as doc:
+        all_pages = range(len(doc))
+        extract = set(all_pages) if pages is None else set(pages)
+        page_nums = sorted(extract)
+
+        if workers <= 1 or len(page_nums) < 2:
+            with TableExtractor(filePath, doc=doc) as table_extractor, tqdm(total=len(page_nums)) as progress:
+                for page_num in all_pages:
+                    if page_num in extract:
+                        items, blocks = _process_page(doc, filePath, page_num, table_extractor, image_dedup, doc_ref)
+                        progress.update(1)
+                    else:
+                        items, blocks = [], _page_blocks(doc, page_num)
+                    yield page_items(page_num, items, blocks)
+            yield flush()
+            return
+
+        shards = deque(_page_shards(page_nums, workers))
+        trace = active_trace()
+        # Each shard dedups its own images; this folds repeats across shards into the first occurrence
+        mp_context = multiprocessing.get_context(PDF_WORKER_START_METHOD)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool, tqdm(total=len(page_nums)) as progress:
+            in_flight = deque()
+            next_page = 0
+            while shards or in_flight:
+                while shards and len(in_flight) < workers * 2:
+                    shard = shards.popleft()
+                    in_flight.append((shard, pool.submit(_process_pages, filePath, shard, doc_ref, trace is not None)))
+                # Wait on the oldest shard first so results stay in page order
+                shard, future = in_flight.popleft()
+                results, spans = future.result()
+                if trace is not None:
+                    trace.extend(spans)
+                for page_num, (items, blocks) in zip(shard, results):
+                    # Pages between shards that are not extracted still feed the chunker
+                    for skipped in range(next_page, page_num):
+                        yield page_items(skipped, [], _page_blocks(doc, skipped))
+                    items = [
+                        item for item in items
+                        if item.get("type") != "image" or "image_hash" not in item or image_dedup.merge(item)
+                    ]
+                    yield page_items(page_num, items, blocks)
+                    next_page = page_num + 1
+                progress.update(len(shard))
+            for skipped in range(next_page, len(doc)):
+                yield page_items(skipped, [], _page_blocks(doc, skipped))
+        yield flush()
+
+def pdf_handler(filePath, dataState: List[DataState], workers: Optional[int] = None) -> List[DataState]:
+    """
+    Extract tables, text chunks, images and page references from every page of a PDF.
+
+    With more than one worker, contiguous page ranges are processed in a process
+    pool and merged back in page order, so the output matches the serial path.
+    """
+    for items in iter_pdf_pages(filePath, workers=workers):
+        dataState.extend(items)
+    return dataState
+
+def ingest_pdf(filePath, workers: Optional[int] = None, document_name: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Extract a PDF and index it in one streaming pass (extract -> embed -> upsert).
+
+    A manifest of per-page content hashes is kept per document name, so
+    re-ingesting a document only re-extracts the tables and images of the pages
+    that changed and deletes the vectors of pages that disappeared. Text is
+    re-chunked over the whole document (chunks span pages), but only chunks
+    that did not exist before are embedded. An unchanged document is served
+    straight from its manifest.
+
+    Returns the data items (without image payloads) and the vector index handle.
+    """
+    document_name = document_name or os.path.basename(filePath)
+    document_hash = fingerprint_file(filePath, f"extractor-v{EXTRACTOR_VERSION}", f"tables-{TABLE_BACKEND}",
+                                     f"chunks-{CHUNK_SIZE}-{CHUNK_OVERLAP}")
+    collection_name = namespace_name("pdf", document_name)
+    manifest = load_manifest(document_name)
+
+    if manifest and manifest["document_hash"] == document_hash and manifest.get("complete"):
+        items = manifest_items(manifest)
+        lexical_index_for(manifest["index"], items)
+        return items, manifest["index"]
+
+    trace = start_trace(document_name)
+    if manifest:
+        # Until this run finishes, the stored manifest no longer matches the index
+        save_manifest(document_name, {**manifest, "complete": False})
+
+    hashes = page_hashes(filePath)
+    reusable = (
+        manifest is not None
+        and manifest.get("complete")
+        and manifest.get("extractor_version") == EXTRACTOR_VERSION
+        and manifest.get("table_backend") == TABLE_BACKEND
+        and manifest.get("index_version") == INDEX_VERSION
+        and manifest.get("embedding_model") == embedding_engine.model_id
+        and manifest.get("collection") == collection_name
+    )
+    if reusable:
+        # Text chunks are rebuilt from the whole document; only per-page items drive re-extraction
+        old_pages = [
+            {**page, "items": [item for item in page["items"] if item.get("type") != "text"]}
+            for page in manifest["pages"]
+        ]
+        indexed_text = {item_id(item) for page in manifest["pages"] for item in page["items"] if item.get("type") == "text"}
+        dirty = dirty_pages(old_pages, hashes)
+        kept_pages = {
+            page_num: prune_pages(page["items"], dirty)
+            for page_num, page in enumerate(old_pages)
+            if page_num < len(hashes) and page_num not in dirty
+        }
+        delete_pages(collection_name, sorted(dirty), exclude_types=["text"])
+    else:
+        indexed_text = set()
+        dirty = set(range(len(hashes)))
+        kept_pages = {}
+        delete_pages(collection_name, None)
+
+    # Images and tables on unchanged pages are known already; repeats on changed pages fold into them
+    image_dedup = ImageDeduplicator()
+    chunk_dedup = ChunkDeduplicator() if CHUNK_DEDUP else None
+    for items in kept_pages.values():
+        for item in items:
+            if item.get("type") == "image" and "image_hash" in item:
+                image_dedup.merge(item)
+            elif item.get("type") == "table" and chunk_dedup is not None:
+                chunk_dedup.add_table(item)
+
+    # Text chunks that are already in the index are kept as they are instead of being embedded again
+    reused_text = []
+    def new_chunks(batches):
+        for items in batches:
+            fresh = []
+            for item in items:
+                if item.get("type") == "text" and item_id(item) in indexed_text:
+                    reused_text.append(item)
+                else:
+                    fresh.append(item)
+            yield fresh
+
+    extract_pages = sorted(page_num for page_num in dirty if page_num < len(hashes))
+    print(f"Re-extracting {len(extract_pages)} of {len(hashes)} pages of {document_name}")
+    new_items, index = build_index_stream(
+        new_chunks(iter_pdf_pages(filePath, workers=workers, pages=extract_pages, image_dedup=image_dedup,
+                                  chunk_dedup=chunk_dedup)),
+        fingerprint=document_hash,
+        collection_name=collection_name,
+        source_name=document_name
+    )
+    new_items += reused_text
+    # Chunks that no longer come out of the document
+    stale_text = indexed_text - {item_id(item) for item in reused_text}
+    if stale_text:
+        index = {**index, "count": delete_items(collection_name, sorted(stale_text))}
+
+    if chunk_dedup is not None and (chunk_dedup.saved or chunk_dedup.table_blocks):
+        print(f"Left out {chunk_dedup.table_blocks} text blocks inside tables; suppressed "
+              f"{chunk_dedup.near_duplicates} near-duplicate and {chunk_dedup.table_duplicates} "
+              f"table-repeating text chunks ({chunk_dedup.saved} embedding calls saved)")
+
+    pages_items = {page_num: list(items) for page_num, items in kept_pages.items()}
+    for item in new_items:
+        pages_items.setdefault(item.get("page", 0), []).append(item)
+    for items in pages_items.values():
+        for item in items:
+            if "pages" in item:
+                item["pages"] = sorted(item["pages"])
+
+    manifest = {
+        "document": document_name,
+        "document_hash": document_hash,
+        "extractor_version": EXTRACTOR_VERSION,
+        "table_backend": TABLE_BACKEND,
+        "index_version": INDEX_VERSION,
+        "embedding_model": embedding_engine.model_id,
+        "collection": collection_name,
+        "complete": index["complete"],
+        "index": index,
+        "pages": [{"hash": page_hash, "items": pages_items.get(page_num, [])} for page_num, page_hash in enumerate(hashes)]
+    }
+    save_manifest(document_name, manifest)
+    items = manifest_items(manifest)
+    # Build the BM25 index now so the first lexical or hybrid query does not pay for it
+    with span("lexical_index"):
+        lexical_index_for(index, items)
+    finish_trace(trace, file=os.path.basename(filePath), pages=len(hashes), extracted_pages=len(extract_pages),
+                 workers=PDF_WORKERS if workers is None else workers, items=len(items))
+    return items, index
+
+def referenced_blobs() -> Set[str]:
+    """
+    Blob references (source PDFs and images) held by any ingested document.
+    """
+    refs: Set[str] = set()
+    for document_name in manifest_names():
+        manifest = load_manifest(document_name)
+        if manifest is None:
+            continue
+        for item in manifest_items(manifest):
+            for key in ["doc_ref", "image_ref"]:
+                if item.get(key):
+                    refs.add(item[key])
+    return refs
+
+def delete_document(document_name: str) -> bool:
+    """
+    Remove an ingested PDF: drop its namespace and its manifest, then the blobs
+    (source PDF and images) that no other document references.
+    """
+    deleted = delete_namespace(namespace_name("pdf", document_name))
+    deleted = delete_manifest(document_name) or deleted
+    if deleted:
+        removed = blob_store.collect_garbage(referenced_blobs())
+        if removed:
+            print(f"Removed {removed} unreferenced blobs")
+    return deleted
@@ -1,20 +1,82 @@
-from typing import List
+from typing import List, Dict, Any, Optional
 from state import DataState
-import base64
+from tools.blob_store import blob_store
+import hashlib
+import os
 import fitz
 
-def process_images(page, page_num, dataState: List[DataState]) -> List[DataState]:
+# Images smaller than this (in pixels, on either side) are treated as decoration and skipped
+IMAGE_MIN_SIZE = int(os.getenv("IMAGE_MIN_SIZE", "32"))
+
+class ImageDeduplicator:
+    """
+    Tracks the images already extracted from a document, so each unique image
+    is decoded, encoded and embedded once. Repeats are matched by xref first and
+    then by a hash of the decoded pixels. They only add their page number to the
+    "pages" list of the first occurrence.
+    """
+
+    def __init__(self):
+        self.by_xref: Dict[int, str] = {}
+        self.by_hash: Dict[str, Dict[str, Any]] = {}
+        self.duplicates = 0
+        self.skipped_small = 0
+
+    def _add_page(self, item: Dict[str, Any], page_num: int):
+        if page_num not in item["pages"]:
+            item["pages"].append(page_num)
+        self.duplicates += 1
+
+    def lookup_xref(self, xref: int, page_num: int) -> bool:
+        image_hash = self.by_xref.get(xref)
+        if image_hash is None:
+            return False
+        self._add_page(self.by_hash[image_hash], page_num)
+        return True
+
+    def merge(self, item: Dict[str, Any], xref: Optional[int] = None) -> bool:
+        """
+        Register an image item. Returns False if it duplicates one already seen,
+        in which case its pages are folded into the existing item.
+        """
+        existing = self.by_hash.get(item["image_hash"])
+        if xref is not None:
+            self.by_xref[xref] = item["image_hash"]
+        if existing is None:
+            self.by_hash[item["image_hash"]] = item
+            return True
+        for page_num in item["pages"]:
+            self._add_page(existing, page_num)
+        return False
+
+def process_images(page, page_num, dataState: List[DataState], dedup: Optional[ImageDeduplicator] = None) -> List[DataState]:
+    dedup = dedup if dedup is not None else ImageDeduplicator()
     images = page.get_images()
     
     for index, image in enumerate(images):
-        xref = image[0]
+        xref, width, height = image[0], image[2], image[3]
+        # Size filter and xref lookup both happen before any decoding work
+        if width < IMAGE_MIN_SIZE or height < IMAGE_MIN_SIZE:
+            dedup.skipped_small += 1
+            continue
+        if dedup.lookup_xref(xref, page_num):
+            continue
+
         pix = fitz.Pixmap(page.parent, xref)
+        image_hash = hashlib.sha256(f"{pix.width}x{pix.height}x{pix.n}:".encode("utf-8") + pix.samples).hexdigest()
+        if image_hash in dedup.by_hash:
+            dedup.merge({"image_hash": image_hash, "pages": [page_num]}, xref=xref)
+            continue
+
         img_bytes = pix.tobytes("png")
-        encoded_image = base64.b64encode(img_bytes).decode("utf-8")
-        
-        dataState.append({
+        # Keep only a reference in the data items; the PNG lives in the blob store
+        item = {
             "page": page_num,
             "type": "image",
-            "image": encoded_image
-        })
-    return dataState
\ No newline at end of file
+            "image_ref": blob_store.put(img_bytes),
+            "image_hash": image_hash,
+            "pages": [page_num]
+        }
+        dedup.merge(item, xref=xref)
+        dataState.append(item)
+    return dataState
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import List, Dict, Any, Optional, Set
+import pymupdf
+
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", "./data/manifests")
+
+def manifest_path(document_name: str) -> str:
+    # Keep the file name readable but filesystem-safe, and unique per document name
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", document_name)[:64]
+    digest = hashlib.sha256(document_name.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(MANIFEST_DIR, f"{slug}.{digest}.json")
+
+def load_manifest(document_name: str) -> Optional[Dict[str, Any]]:
+    path = manifest_path(document_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable manifest {path}: {e}")
+        return None
+
+def save_manifest(document_name: str, manifest: Dict[str, Any]):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(document_name)
+    fd, temp_path = tempfile.mkstemp(dir=MANIFEST_DIR, suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+def delete_manifest(document_name: str) -> bool:
+    path = manifest_path(document_name)
+    if not os.path.exists(path):
+        return False
+    os.unlink(path)
+    return True
+
+def manifest_names() -> List[str]:
+    """
+    Names of the documents that have a manifest.
+    """
+    if not os.path.isdir(MANIFEST_DIR):
+        return []
+    names = []
+    for file_name in sorted(os.listdir(MANIFEST_DIR)):
+        if file_name.endswith(".json"):
+            try:
+                with open(os.path.join(MANIFEST_DIR, file_name), "r", encoding="utf-8") as f:
+                    names.append(json.load(f)["document"])
+            except Exception as e:
+                print(f"Ignoring unreadable manifest {file_name}: {e}")
+    return names
+
+def manifest_items(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Flatten the per-page items of a manifest into data items, in page order.
+    """
+    return [item for page in manifest["pages"] for item in page["items"]]
+
+def page_hashes(filePath) -> List[str]:
+    """
+    Hash each page's content stream, size and embedded image streams.
+
+    This is much cheaper than extraction. It does not depend on xref numbers,
+    so a page whose content is unchanged keeps its hash even if the file was
+    rewritten.
+    """
+    hashes = []
+    image_digests: Dict[int, str] = {}
+    with pymupdf.open(filePath) as doc:
+        for page in doc:
+            digest = hashlib.sha256()
+            digest.update(repr(tuple(page.rect)).encode("utf-8"))
+            digest.update(page.read_contents())
+            for image in page.get_images():
+                xref = image[0]
+                if xref not in image_digests:
+                    image_digests[xref] = hashlib.sha256(doc.xref_stream_raw(xref) or b"").hexdigest()
+                digest.update(image_digests[xref].encode("utf-8"))
+            hashes.append(digest.hexdigest())
+    return hashes
+
+def dirty_pages(old_pages: List[Dict[str, Any]], new_hashes: List[str]) -> Set[int]:
+    """
+    Return the page numbers whose items must be rebuilt: changed, added and removed pages.
+
+    An image is owned by the first page it appears on. If an owning page
+    changes, the unchanged pages that reuse the image are rebuilt as well, so
+    the image is not lost.
+    """
+    dirty = {
+        page_num for page_num, page_hash in enumerate(new_hashes)
+        if page_num >= len(old_pages) or old_pages[page_num]["hash"] != page_hash
+    }
+    dirty |= set(range(len(new_hashes), len(old_pages)))
+
+    grew = True
+    while grew:
+        grew = False
+        for page_num in sorted(dirty):
+            if page_num >= len(old_pages):
+                continue
+            for item in old_pages[page_num]["items"]:
+                for shared_page in item.get("pages", []):
+                    if shared_page not in dirty and shared_page < len(new_hashes):
+                        dirty.add(shared_page)
+                        grew = True
+    return dirty
+
+def prune_pages(items: List[Dict[str, Any]], dirty: Set[int]) -> List[Dict[str, Any]]:
+    """
+    Drop references to rebuilt pages from kept items; re-extraction adds them back if still present.
+    """
+    pruned = []
+    for item in items:
+        if "pages" in item:
+            item = {**item, "pages": [page_num for page_num in item["pages"] if page_num not in dirty]}
+        pruned.append(item)
+    return pruned
@@ -1,14 +1,45 @@
 from state import DataState
-from typing import List
+from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from tools.blob_store import blob_store
 import base64
+import os
+import pymupdf
 
-def process_page_images(page, page_num, dataState: List[DataState]) -> List[DataState]:
-    pix = page.get_pixmap()
-    page_bytes = pix.tobytes("png")
-    encoded_page = base64.b64encode(page_bytes).decode("utf-8")
+PAGE_RENDER_DPI = int(os.getenv("PAGE_RENDER_DPI", "72"))
+PAGE_RENDER_FORMAT = os.getenv("PAGE_RENDER_FORMAT", "png")
+PAGE_RENDER_CACHE_SIZE = int(os.getenv("PAGE_RENDER_CACHE_SIZE", "32"))
+# Bounds for renders requested through the API; pixmap memory grows with the square of the DPI
+PAGE_RENDER_MIN_DPI = 36
+PAGE_RENDER_MAX_DPI = int(os.getenv("PAGE_RENDER_MAX_DPI", "300"))
+PAGE_RENDER_FORMATS = ["png", "jpeg"]
+
+def process_page_images(page, page_num, dataState: List[DataState], doc_ref: Optional[str] = None) -> List[DataState]:
+    # Rendering is deferred until someone asks for the page image;
+    # record where the page can be rendered from instead
     dataState.append({
             "page": page_num,
             "type": "page",
-            "image": encoded_page
+            "doc_ref": doc_ref
         })
-    return dataState
\ No newline at end of file
+    return dataState
+
+@lru_cache(maxsize=PAGE_RENDER_CACHE_SIZE)
+def render_page(doc_ref: str, page_num: int, dpi: int = PAGE_RENDER_DPI, fmt: str = PAGE_RENDER_FORMAT) -> bytes:
+    """
+    Rasterize one page of a PDF stored in the blob store. Recent renders are kept in an LRU cache.
+    """
+    with pymupdf.open(blob_store.path(doc_ref)) as doc:
+        pix = doc[page_num].get_pixmap(dpi=dpi)
+        return pix.tobytes(fmt)
+
+def page_image(item: Dict[str, Any], dpi: int = PAGE_RENDER_DPI, fmt: str = PAGE_RENDER_FORMAT) -> bytes:
+    """
+    Return the rendered image for a "page" data item.
+    """
+    if not item.get("doc_ref"):
+        raise ValueError(f"Page {item.get('page')} has no source document to render from")
+    return render_page(item["doc_ref"], item["page"], dpi, fmt)
+
+def page_image_b64(item: Dict[str, Any], dpi: int = PAGE_RENDER_DPI, fmt: str = PAGE_RENDER_FORMAT) -> str:
+    return base64.b64encode(page_image(item, dpi, fmt)).decode("utf-8")
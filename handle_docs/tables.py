@@ -1,25 +1,116 @@
 from state import DataState
+import os
 import pdfplumber
-from typing import List
+import pymupdf
+from typing import List, Optional, Tuple
 
-def process_tables(filepath, page_num, dataState: List[DataState]) -> List[DataState]:
+# "pdfplumber" uses pdfplumber's extract_tables(); "pymupdf" uses page.find_tables(), which is
+# faster but finds fewer tables (6 of the 10 in attention.pdf), so it is opt-in
+TABLE_BACKEND = os.getenv("TABLE_BACKEND", "pdfplumber")
+TABLE_BACKENDS = ["pymupdf", "pdfplumber"]
+
+# A table's rows of cells and its bounding box (x0, top, x1, bottom) in PDF points
+Table = Tuple[List[List[Optional[str]]], Tuple[float, float, float, float]]
+
+class TableExtractor:
+    """
+    Extracts tables page by page from a document that is opened only once.
+
+    Both backends find tables from ruling lines, so pages without any vector
+    drawings are skipped before running the full layout analysis. If the
+    PyMuPDF backend fails on a page, pdfplumber is used for that page instead.
+    """
+
+    def __init__(self, filepath, backend: str = TABLE_BACKEND, doc=None, prefilter: bool = True):
+        if backend not in TABLE_BACKENDS:
+            raise ValueError(f"Unknown table backend: {backend} (expected one of {TABLE_BACKENDS})")
+        self.filepath = filepath
+        self.backend = backend
+        self.prefilter = prefilter
+        self.skipped_pages = 0
+        self._owns_doc = doc is None
+        self._doc = doc if doc is not None else pymupdf.open(filepath)
+        self._plumber = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if self._owns_doc and self._doc is not None:
+            self._doc.close()
+        self._doc = None
+
+    def has_ruling_lines(self, page_num: int) -> bool:
+        """
+        Cheap check for any vector drawings (lines, rectangles, curves) on the page.
+        """
+        return len(self._doc[page_num].get_cdrawings()) > 0
+
+    def _extract_pymupdf(self, page_num: int) -> List[Table]:
+        finder = self._doc[page_num].find_tables()
+        return [(table.extract(), tuple(table.bbox)) for table in finder.tables]
+
+    def _extract_pdfplumber(self, page_num: int) -> List[Table]:
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.filepath)
+        page = self._plumber.pages[page_num]
+        try:
+            # Same tables as extract_tables(), plus where they are
+            return [(table.extract(), tuple(table.bbox)) for table in page.find_tables()]
+        finally:
+            # pdfplumber caches every parsed page's objects until closed, so memory would grow with page count
+            page.close()
+
+    def find(self, page_num: int) -> List[Table]:
+        """
+        Return the tables on a page with their bounding boxes.
+        """
+        if self.prefilter and not self.has_ruling_lines(page_num):
+            self.skipped_pages += 1
+            return []
+
+        if self.backend == "pymupdf":
+            try:
+                return self._extract_pymupdf(page_num)
+            except Exception as e:
+                print(f"PyMuPDF table extraction failed on page {page_num}, falling back to pdfplumber: {e}")
+        return self._extract_pdfplumber(page_num)
+
+    def extract(self, page_num: int) -> List[List[List[Optional[str]]]]:
+        """
+        Return the tables on a page as lists of rows of cells.
+        """
+        return [rows for rows, _ in self.find(page_num)]
+
+def process_tables(filepath, page_num, dataState: List[DataState], extractor: Optional[TableExtractor] = None) -> List[DataState]:
     try:
-        with pdfplumber.open(filepath) as pdf:
-            page = pdf.pages[page_num]
-            tables = page.extract_tables()
+        if extractor is None:
+            # One-off extraction; callers walking a whole document should pass a shared extractor
+            with TableExtractor(filepath) as page_extractor:
+                tables = page_extractor.find(page_num)
+        else:
+            tables = extractor.find(page_num)
         
-            if not tables:
-                return dataState
-        
-            for table_index, table in enumerate(tables):
-                table_text = "\n".join(
-                    [" | ".join([str(cell) if cell is not None else "" for cell in row]) for row in table]
-                )
-                dataState.append({
-                    "page": page_num,
-                    "type": "table",
-                    "text": table_text
-                })
+        if not tables:
+            return dataState
+    
+        for table_index, (table, bbox) in enumerate(tables):
+            table_text = "\n".join(
+                [" | ".join([str(cell) if cell is not None else "" for cell in row]) for row in table]
+            )
+            dataState.append({
+                "page": page_num,
+                "type": "table",
+                "text": table_text,
+                # Lets the text blocks inside the table be left out of the text chunks
+                "bbox": [round(value, 2) for value in bbox]
+            })
     
     except Exception as e:
         dataState.append({
@@ -28,4 +119,4 @@ def process_tables(filepath, page_num, dataState: List[DataState]) -> List[DataS
             "text": f"Error extracting tables: {str(e)}"
         })
     
-    return dataState
\ No newline at end of file
+    return dataState
@@ -1,12 +1,125 @@
-from typing import List
+from typing import List, Dict, Any, Tuple
+import os
+import re
 from state import DataState
 
-def process_text_chunks(text, text_splitter, page_num, dataState: List[DataState]) -> List[DataState]:
-    chunks = text_splitter.split_text(text)
-    for i, chunk in enumerate(chunks):
-        dataState.append({
-            "page": page_num,
+# Character budget of a text chunk and how much of the previous chunk it repeats
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "700"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# A layout block: its bounding box (x0, y0, x1, y1) and its text
+Block = Tuple[float, float, float, float, str]
+
+def page_blocks(page) -> List[Block]:
+    """
+    A page's text blocks in reading order, with in-block line breaks folded.
+    """
+    blocks = []
+    for block in page.get_text("blocks", sort=False):
+        # block = (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image
+        if block[6] != 0:
+            continue
+        # Same as collapsing whitespace runs with a regex and stripping, at a fraction of the cost
+        text = " ".join(block[4].split())
+        if text:
+            blocks.append((block[0], block[1], block[2], block[3], text))
+    return blocks
+
+def _sentences(text: str, limit: int) -> List[str]:
+    # Blocks are packed sentence by sentence; sentences longer than the budget are cut at spaces, then hard
+    pieces: List[str] = []
+    for sentence in SENTENCE_END.split(text):
+        while len(sentence) > limit:
+            cut = sentence.rfind(" ", 0, limit + 1)
+            cut = cut if cut > 0 else limit
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+class DocumentChunker:
+    """
+    Packs a document's layout blocks into chunks as they stream in, page by page.
+
+    Chunks fill up to chunk_size characters across page boundaries, so
+    paragraphs that continue on the next page stay together and page tails do
+    not become fragments of their own. A block that fits is added whole; one
+    that does not is split into sentences, so chunks only break between
+    sentences. Block boundaries are kept as line breaks, and the overlap is
+    made of whole trailing units. Each chunk keeps its first page as "page" and, when it
+    spans several, the covered pages as "pages".
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # Pending units of the chunk being filled: text prefixed with its separator, and its page
+        self._units: List[str] = []
+        self._pages: List[int] = []
+        # Length of the chunk text so far, counting one separator per unit
+        self._length = 0
+        # Leading units carried over from the previous chunk
+        self._overlap = 0
+
+    def _emit(self) -> Dict[str, Any]:
+        first, last = self._pages[0], self._pages[-1]
+        item: Dict[str, Any] = {
+            "page": first,
             "type": "text",
-            "text": chunk
-        })    
-    return dataState
\ No newline at end of file
+            "text": "".join(self._units)[1:]
+        }
+        if last != first:
+            item["pages"] = sorted(set(self._pages))
+        # Keep the tail of this chunk as the start of the next one
+        keep, length = len(self._units), 0
+        while keep > 0 and length + len(self._units[keep - 1]) <= self.chunk_overlap:
+            keep -= 1
+            length += len(self._units[keep])
+        self._units = self._units[keep:]
+        self._pages = self._pages[keep:]
+        self._length = length
+        self._overlap = len(self._units)
+        return item
+
+    def _add(self, unit: str, page_num: int, chunks: List[DataState]):
+        if self._units and self._length + len(unit) > self.chunk_size:
+            if len(self._units) > self._overlap:
+                chunks.append(self._emit())
+            # Drop overlap that no longer leaves room for the next unit
+            while self._units and self._length + len(unit) > self.chunk_size:
+                self._length -= len(self._units.pop(0))
+                self._pages.pop(0)
+                self._overlap = max(0, self._overlap - 1)
+        self._units.append(unit)
+        self._pages.append(page_num)
+        self._length += len(unit)
+
+    def feed(self, page_num: int, blocks: List[str]) -> List[DataState]:
+        """
+        Add the text of a page's blocks; returns the chunks completed so far.
+        """
+        chunks: List[DataState] = []
+        for block in blocks:
+            if self._length + len(block) + 1 <= self.chunk_size:
+                self._units.append("\n" + block)
+                self._pages.append(page_num)
+                self._length += len(block) + 1
+                continue
+            for i, text in enumerate(_sentences(block, self.chunk_size)):
+                self._add(("\n" if i == 0 else " ") + text, page_num, chunks)
+        return chunks
+
+    def flush(self) -> List[DataState]:
+        """
+        Emit the last, partially filled chunk.
+        """
+        if len(self._units) > self._overlap:
+            chunk = self._emit()
+            self._units, self._pages = [], []
+            self._length = 0
+            self._overlap = 0
+            return [chunk]
+        return []
@@ -1,8 +1,43 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import os
 
-def db_handler(filePath: str) -> List[Dict[str, Any]]:
+def db_handler(filePath: str, source_name: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Handle DB file processing and return structured data for the workflow
+    Handle DB file processing and return structured data for the workflow.
+    source_name identifies the database (its namespace in the vector store).
+    The schema chunks are embedded here, once per schema version (see ingest_db).
+    """
+    return ingest_db(filePath, source_name)[0]
+
+def ingest_db(filePath: str, source_name: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Extract a database's schema chunks and index them, so queries only need to embed the question.
+    Returns the data items and the vector index handle (None if the schema could not be read).
+    """
+    source_name = source_name or os.path.basename(filePath)
+    data_items = schema_items(filePath, source_name)
+    if any(item.get("type") == "error" for item in data_items):
+        return data_items, None
+    
+    # Import here to avoid circular imports
+    from tools.vector_index import build_schema_index
+    try:
+        index = build_schema_index(data_items, source_name)
+    except Exception as e:
+        print(f"Error indexing DB schema: {e}")
+        index = None
+    return data_items, index
+
+def delete_db(source_name: str) -> bool:
+    """
+    Remove an ingested database's schema vectors. Returns False if it was never indexed.
+    """
+    from tools.vector_index import delete_namespace, namespace_name
+    return delete_namespace(namespace_name("sql", source_name))
+
+def schema_items(filePath: str, source_name: str) -> List[Dict[str, Any]]:
+    """
+    Read the database schema and chunk it into groups of related tables.
     """
     try:
         # Convert file path to SQLite URI format
@@ -28,6 +63,7 @@ def db_handler(filePath: str) -> List[Dict[str, Any]]:
                 "page": i,  # Using page as chunk index
                 "type": "schema",
                 "text": chunk,
+                "source": source_name,
                 "embeddings": None
             })
         
@@ -43,4 +79,4 @@ def db_handler(filePath: str) -> List[Dict[str, Any]]:
             "type": "error",
             "text": f"Error processing database: {str(e)}",
             "embeddings": None
-        }]
\ No newline at end of file
+        }]
@@ -1,32 +1,31 @@
-from handle_docs.handler import pdf_handler
-from handle_sql.handler_sql import db_handler
+from handle_docs.handler import ingest_pdf
+from handle_sql.handler_sql import ingest_db
 import os
 from agents.workflow import create_workflow
 from database_mcp.client import mcp_client
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 def get_file_extension(filepath: str) -> str:
     """Get file extension from filepath"""
     return os.path.splitext(filepath)[1].lower()
 
-def process_file(filepath: str) -> List[Dict[str, Any]]:
-    """Process file based on its extension"""
+def process_file(filepath: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Process file based on its extension, returning the data items and vector index handle"""
     file_extension = get_file_extension(filepath)
     
     if file_extension == '.pdf':
         print("Processing PDF file...")
-        initial_data_state: List[Dict[str, Any]] = []
-        processed_data = pdf_handler(filePath=filepath, dataState=initial_data_state)
+        processed_data, index = ingest_pdf(filePath=filepath)
         print(f"Processed {len(processed_data)} PDF data items")
-        return processed_data
+        return processed_data, index
     
     elif file_extension == '.db':
         print("Processing DB file...")
         # Set database path for MCP client
         mcp_client.set_database_path(filepath)
-        processed_data = db_handler(filePath=filepath)
+        processed_data, index = ingest_db(filePath=filepath)
         print(f"Processed DB file with {len(processed_data)} schema chunks")
-        return processed_data
+        return processed_data, index
     
     else:
         raise ValueError(f"Unsupported file type: {file_extension}")
@@ -47,7 +46,7 @@ if __name__ == "__main__":
             exit(1)
 
         # Process file based on extension
-        processed_data = process_file(filepath)
+        processed_data, index = process_file(filepath)
 
         # Create workflow with proper state
         print("Creating workflow...")
@@ -68,7 +67,9 @@ if __name__ == "__main__":
             "final_answer": "",
             "next": None,
             "data_items": processed_data,
-            "sql_query": None  # Added for SQL workflow
+            "sql_query": None,  # Added for SQL workflow
+            "pdf_index": index if get_file_extension(filepath) == '.pdf' else None,
+            "db_index": index if get_file_extension(filepath) == '.db' else None
         })
 
         print("\nFinal Answer:")
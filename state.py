@@ -1,5 +1,9 @@
 from typing import List, Optional, Dict, Any
-from typing_extensions import TypedDict
+from typing_extensions import TypedDict, Annotated
+
+def merge_results(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Parallel branches each add their own entry
+    return {**(left or {}), **(right or {})}
 
 class DataState(TypedDict):
     user_query: str
@@ -7,4 +11,9 @@ class DataState(TypedDict):
     final_answer: Optional[str]
     next: Optional[str]
     data_items: List[Dict[str, Any]]
-    sql_query: Optional[str]  # Added for SQL workflow
\ No newline at end of file
+    sql_query: Optional[str]  # Added for SQL workflow
+    pdf_index: Optional[Dict[str, Any]]  # Vector index handle of the PDF data, built at upload time
+    db_index: Optional[Dict[str, Any]]  # Vector index handle of the database schema, built at upload time
+    retrieval_mode: Optional[str]  # "lexical", "vector" or "hybrid"; None uses RETRIEVAL_MODE
+    speculation: Optional[Any]  # Per-request Speculation shared by the supervisor and speculative branches
+    speculative_results: Annotated[Dict[str, Dict[str, Any]], merge_results]  # Outputs of speculative branches
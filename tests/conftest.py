@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# Keep the tests away from ./data and off the network: every store goes to a
+# scratch directory and embeddings use the offline hashing provider.
+WORK_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+for variable, name in [("CHROMA_DIR", "chroma"), ("BLOB_STORE_DIR", "blobs"), ("MANIFEST_DIR", "manifests"),
+                       ("LOCAL_INDEX_DIR", "local_index"), ("EMBEDDING_CACHE_DIR", "embedding_cache"),
+                       ("INGEST_TRACE_DIR", "traces"), ("SQL_CACHE_DIR", "sql_cache")]:
+    os.environ.setdefault(variable, os.path.join(WORK_DIR, name))
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+ATTENTION_PDF = os.path.join(REPO_ROOT, "attention.pdf")
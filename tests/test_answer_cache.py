@@ -0,0 +1,22 @@
+from tools.answer_cache import AnswerCache
+from tools.sql_cache import SQLCache
+
+ANSWER = {"final_answer": "42 orders", "context_docs": ""}
+
+def test_semantic_hits_need_the_same_literals():
+    cache = AnswerCache(threshold=0.9)
+    cache.put("v1", "How many orders did customer 17 place in 2023?", [1.0, 0.0], ANSWER)
+
+    assert cache.get_similar("v1", "how many orders were placed by customer 17 in 2023", [1.0, 0.01]) == ANSWER
+    # Same meaning to the embedding, different answer
+    assert cache.get_similar("v1", "How many orders did customer 18 place in 2023?", [1.0, 0.0]) is None
+    assert cache.get_similar("v1", "How many orders did customer 17 place in 2024?", [1.0, 0.0]) is None
+
+def test_sql_cache_contains_does_not_count_a_hit(tmp_path):
+    cache = SQLCache(cache_dir=str(tmp_path))
+    cache.put("Orders above 100", "schema", "model", "SELECT * FROM orders WHERE total > 100", "orders(total)")
+
+    assert cache.contains("orders above  100", "schema", "model")
+    assert cache.contains("Orders above 250", "schema", "model")
+    assert not cache.contains("Orders above 100", "other schema", "model")
+    assert cache._connect().execute("SELECT SUM(hits) FROM sql_cache").fetchone()[0] == 0
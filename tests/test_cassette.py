@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from tools.cassette import Cassette, CassetteEmbeddingProvider, CassetteLLM, CassetteMiss
+from tools.embedding_providers import HashingProvider
+
+PROMPTS = ["Multi-head attention", "Positional encoding", "Multi-head attention"]
+
+class DisabledProvider:
+    model_id = HashingProvider().model_id
+    remote = True
+
+    def embed(self, prompt=None, image=None):
+        raise AssertionError("the provider must not be called in replay mode")
+
+def test_replay_serves_recorded_vectors_without_the_provider(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    recorder = Cassette(path, mode="record")
+    recorded = [CassetteEmbeddingProvider(recorder, HashingProvider()).embed(prompt=prompt) for prompt in PROMPTS]
+    recorder.close()
+
+    player = Cassette(path, mode="replay", latency="none")
+    provider = CassetteEmbeddingProvider(player, DisabledProvider())
+    replayed = [provider.embed(prompt=prompt) for prompt in PROMPTS]
+    assert player.replayed == len(PROMPTS)
+    for original, copy in zip(recorded, replayed):
+        assert np.array_equal(np.asarray(original, dtype=np.float32), np.asarray(copy, dtype=np.float32))
+    assert not provider.remote
+    with pytest.raises(CassetteMiss):
+        provider.embed(prompt="never recorded")
+
+def test_replay_serves_llm_answers_in_recorded_order(tmp_path):
+    class Reply:
+        def __init__(self, content):
+            self.content = content
+
+    class FakeLLM:
+        def __init__(self):
+            self.calls = 0
+
+        def invoke(self, prompt):
+            self.calls += 1
+            return Reply(f"answer {self.calls}")
+
+    path = str(tmp_path / "llm.jsonl.gz")
+    recorder = Cassette(path, mode="record")
+    llm = CassetteLLM(recorder, "model", FakeLLM)
+    assert [llm.invoke("route?").content for _ in range(2)] == ["answer 1", "answer 2"]
+    recorder.close()
+
+    def no_llm():
+        raise AssertionError("the model must not be created in replay mode")
+
+    player = CassetteLLM(Cassette(path, mode="replay", latency="none"), "model", no_llm)
+    # Repeated requests replay in order, then the last recording repeats
+    assert [player.invoke("route?").content for _ in range(3)] == ["answer 1", "answer 2", "answer 2"]
@@ -0,0 +1,42 @@
+import pymupdf
+from handle_docs.dedup import ChunkDeduplicator
+from handle_docs.handler import iter_pdf_pages
+from handle_docs.text_chunks import page_blocks
+
+PROSE = "The results below compare the base and big models on both translation tasks."
+CELLS = [["Model", "EN-DE", "EN-FR"], ["Transformer base", "27.3", "38.1"], ["Transformer big", "28.4", "41.8"]]
+
+def make_table_pdf(path: str) -> str:
+    """
+    One page with a paragraph and a ruled 3x3 table below it.
+    """
+    with pymupdf.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 80), PROSE, fontsize=10)
+        x0, y0, widths, height = 72, 120, [160, 80, 80], 24
+        xs = [x0 + sum(widths[:i]) for i in range(len(widths) + 1)]
+        ys = [y0 + height * i for i in range(len(CELLS) + 1)]
+        for x in xs:
+            page.draw_line((x, ys[0]), (x, ys[-1]))
+        for y in ys:
+            page.draw_line((xs[0], y), (xs[-1], y))
+        for row, cells in enumerate(CELLS):
+            for column, cell in enumerate(cells):
+                page.insert_text((xs[column] + 4, ys[row] + 16), cell, fontsize=10)
+        doc.save(path)
+    return path
+
+def test_table_text_is_left_out_of_text_chunks(tmp_path):
+    path = make_table_pdf(str(tmp_path / "table.pdf"))
+    with pymupdf.open(path) as doc:
+        # Without dedup, the cells would be chunked as prose as well
+        assert any("Transformer big" in block[4] for block in page_blocks(doc[0]))
+
+    chunk_dedup = ChunkDeduplicator()
+    items = [item for batch in iter_pdf_pages(path, workers=1, chunk_dedup=chunk_dedup) for item in batch]
+
+    tables = [item for item in items if item["type"] == "table"]
+    texts = [item["text"] for item in items if item["type"] == "text"]
+    assert len(tables) == 1 and "Transformer big" in tables[0]["text"]
+    assert texts == [PROSE]
+    assert chunk_dedup.table_blocks > 0
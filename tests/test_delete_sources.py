@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import numpy as np
+import pymupdf
+from handle_docs.handler import ingest_pdf, delete_document
+from handle_sql.handler_sql import ingest_db, delete_db
+from tools.blob_store import blob_store
+from tools.vector_index import list_namespaces, namespace_name
+
+def make_pdf(path: str, text: str, pixels: bytes) -> str:
+    with pymupdf.open() as doc:
+        page = doc.new_page()
+        page.insert_text((50, 60), text, fontsize=10)
+        page.insert_image(pymupdf.Rect(50, 100, 178, 228), pixmap=pymupdf.Pixmap(pymupdf.csRGB, 64, 64, pixels, 0))
+        doc.save(path)
+    return path
+
+def blob_refs(items):
+    return {item[key] for item in items for key in ["doc_ref", "image_ref"] if item.get(key)}
+
+def namespaces():
+    return {namespace["namespace"] for namespace in list_namespaces()}
+
+def test_delete_document_drops_its_namespace_and_only_its_blobs(tmp_path):
+    shared_image = np.random.default_rng(1).integers(0, 256, (64, 64, 3), dtype=np.uint8).tobytes()
+    items_a, _ = ingest_pdf(make_pdf(str(tmp_path / "a.pdf"), "First report.", shared_image), workers=1,
+                            document_name="gc-a.pdf")
+    items_b, _ = ingest_pdf(make_pdf(str(tmp_path / "b.pdf"), "Second report.", shared_image), workers=1,
+                            document_name="gc-b.pdf")
+    refs_a, refs_b = blob_refs(items_a), blob_refs(items_b)
+    shared = refs_a & refs_b
+    assert len(shared) == 1 and len(refs_a - shared) == 1
+    # Age the blobs past the grace period that protects ingests in progress
+    for digest in refs_a | refs_b:
+        os.utime(blob_store.path(digest), (0, 0))
+
+    assert delete_document("gc-a.pdf")
+    assert namespace_name("pdf", "gc-a.pdf") not in namespaces()
+    assert namespace_name("pdf", "gc-b.pdf") in namespaces()
+    assert not any(blob_store.exists(digest) for digest in refs_a - shared)
+    assert all(blob_store.exists(digest) for digest in refs_b)
+
+    assert delete_document("gc-b.pdf")
+    assert not any(blob_store.exists(digest) for digest in refs_b)
+    assert not delete_document("gc-b.pdf")
+
+def test_delete_db_drops_its_schema_namespace(tmp_path):
+    db_path = str(tmp_path / "inventory.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE parts (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.close()
+    _, index = ingest_db(db_path, "inventory.db")
+    assert index["collection"] in namespaces()
+
+    assert delete_db("inventory.db")
+    assert index["collection"] not in namespaces()
+    assert not delete_db("inventory.db")
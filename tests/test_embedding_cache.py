@@ -0,0 +1,27 @@
+import chromadb
+from tools.embedding_cache import EmbeddingCache, cache_key
+
+def test_warm_from_chroma_skips_other_models(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    same = client.create_collection("pdf_same", metadata={"embedding_model": "model-a"})
+    same.add(ids=["1"], documents=["shared text"], embeddings=[[1.0, 0.0, 0.0]])
+    other = client.create_collection("pdf_other", metadata={"embedding_model": "model-b"})
+    other.add(ids=["1"], documents=["other text"], embeddings=[[0.0, 1.0, 0.0]])
+    unlabelled = client.create_collection("pdf_unlabelled")
+    unlabelled.add(ids=["1"], documents=["old text"], embeddings=[[0.0, 0.0, 1.0]])
+
+    cache = EmbeddingCache(cache_dir=str(tmp_path / "cache"))
+    assert cache.warm_from_chroma(str(tmp_path / "chroma"), "model-a") == 1
+    assert cache.get(cache_key("model-a", prompt="shared text")) == [1.0, 0.0, 0.0]
+    assert cache.get(cache_key("model-a", prompt="other text")) is None
+    assert cache.get(cache_key("model-a", prompt="old text")) is None
+
+def test_warm_from_chroma_reads_unlabelled_collections_with_assume_model(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    legacy = client.create_collection("rag_collection")
+    legacy.add(ids=["0"], documents=["old text"], embeddings=[[0.0, 0.0, 1.0]])
+
+    cache = EmbeddingCache(cache_dir=str(tmp_path / "cache"))
+    assert cache.warm_from_chroma(str(tmp_path / "chroma"), "model-a", assume_model="model-b") == 0
+    assert cache.warm_from_chroma(str(tmp_path / "chroma"), "model-a", assume_model="model-a") == 1
+    assert cache.get(cache_key("model-a", prompt="old text")) == [0.0, 0.0, 1.0]
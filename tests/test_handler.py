@@ -0,0 +1,10 @@
+from conftest import ATTENTION_PDF
+from handle_docs.handler import iter_pdf_pages
+
+def extract(workers: int):
+    return [item for batch in iter_pdf_pages(ATTENTION_PDF, workers=workers) for item in batch]
+
+def test_parallel_extraction_matches_serial():
+    serial = extract(1)
+    assert serial
+    assert extract(2) == serial
@@ -0,0 +1,27 @@
+import numpy as np
+import pymupdf
+from handle_docs.images import process_images, ImageDeduplicator
+
+def pixmap(seed: int, size: int = 64) -> pymupdf.Pixmap:
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    return pymupdf.Pixmap(pymupdf.csRGB, size, size, pixels.tobytes(), 0)
+
+def test_repeated_images_are_extracted_once():
+    rect = pymupdf.Rect(50, 50, 178, 178)
+    doc = pymupdf.open()
+    xref = doc.new_page().insert_image(rect, pixmap=pixmap(1))
+    # Same image object on page 1; the same pixels stored again as a PNG stream (a new xref) on page 2
+    doc.new_page().insert_image(rect, xref=xref)
+    doc.new_page().insert_image(rect, stream=pixmap(1).tobytes("png"))
+    doc.new_page().insert_image(rect, pixmap=pixmap(2))
+    doc.new_page().insert_image(rect, pixmap=pixmap(3, size=16))
+
+    dedup = ImageDeduplicator()
+    items = []
+    for page_num, page in enumerate(doc):
+        process_images(page, page_num, items, dedup=dedup)
+
+    assert [item["pages"] for item in items] == [[0, 1, 2], [3]]
+    assert dedup.duplicates == 2
+    assert dedup.skipped_small == 1
+    assert len(dedup.by_xref) == 3
@@ -0,0 +1,46 @@
+import pymupdf
+import handle_docs.handler as handler
+from handle_docs.handler import ingest_pdf
+from tools.vector_index import open_namespace, namespace_name
+
+def make_pdf(path: str, texts) -> str:
+    with pymupdf.open() as doc:
+        for text in texts:
+            doc.new_page().insert_textbox(pymupdf.Rect(50, 50, 550, 750), text, fontsize=10)
+        doc.save(path)
+    return path
+
+def page_text(page_num: int, version: str = "first") -> str:
+    return " ".join(f"Page {page_num} {version} edition sentence {i} about measurement {page_num * 10 + i}."
+                    for i in range(12))
+
+def indexed_documents(document_name: str):
+    return set(open_namespace(namespace_name("pdf", document_name)).get(include=["documents"])["documents"])
+
+def test_reingest_only_extracts_changed_pages(tmp_path, monkeypatch):
+    extracted = []
+    process_page = handler._process_page
+    def spy(doc, filePath, page_num, *args):
+        extracted.append(page_num)
+        return process_page(doc, filePath, page_num, *args)
+    monkeypatch.setattr(handler, "_process_page", spy)
+
+    original = make_pdf(str(tmp_path / "v1.pdf"), [page_text(0), page_text(1), page_text(2)])
+    items, _ = ingest_pdf(original, workers=1, document_name="incremental.pdf")
+    assert extracted == [0, 1, 2]
+    assert indexed_documents("incremental.pdf") == {item["text"] for item in items if item["type"] == "text"}
+
+    # Unchanged: served from the manifest, nothing extracted
+    extracted.clear()
+    assert ingest_pdf(original, workers=1, document_name="incremental.pdf")[0] == items
+    assert extracted == []
+
+    # One page changed: only it is extracted, and its old chunks leave the index
+    changed = make_pdf(str(tmp_path / "v2.pdf"), [page_text(0), page_text(1, "second"), page_text(2)])
+    items, index = ingest_pdf(changed, workers=1, document_name="incremental.pdf")
+    assert extracted == [1]
+    texts = {item["text"] for item in items if item["type"] == "text"}
+    assert indexed_documents("incremental.pdf") == texts
+    assert index["count"] == len(texts)
+    assert not any("Page 1 first edition" in text for text in texts)
+    assert any("Page 1 second edition" in text for text in texts)
@@ -0,0 +1,50 @@
+import threading
+from conftest import REPO_ROOT
+from tools.ingest_report import resolve_trace
+from tools.ingest_trace import start_trace, finish_trace, span, active_trace
+from tools.vector_index import _prefetch
+
+def test_concurrent_ingests_keep_their_own_spans():
+    traces = {}
+    ready = threading.Barrier(2)
+
+    def ingest(name: str):
+        trace = start_trace(name, enabled=True)
+        ready.wait()
+        for page in range(20):
+            with span("tables", page, document=name):
+                pass
+        traces[name] = trace
+        finish_trace(trace)
+
+    threads = [threading.Thread(target=ingest, args=(name,)) for name in ["a.pdf", "b.pdf"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, trace in traces.items():
+        assert len(trace.spans) == 20
+        assert {record["document"] for record in trace.spans} == {name}
+
+def test_prefetch_thread_records_into_the_callers_trace():
+    def batches():
+        for page in range(3):
+            with span("text_blocks", page):
+                pass
+            yield [page]
+
+    trace = start_trace("prefetch.pdf", enabled=True)
+    assert list(_prefetch(batches(), maxsize=1)) == [[0], [1], [2]]
+    assert [record["page"] for record in trace.spans] == [0, 1, 2]
+    finish_trace(trace)
+    assert active_trace() is None
+
+def test_document_name_is_not_read_as_a_trace_file(monkeypatch):
+    # attention.pdf exists in the repository root but is not a trace
+    monkeypatch.chdir(REPO_ROOT)
+    assert resolve_trace("attention.pdf") != "attention.pdf"
+
+    trace = start_trace("attention.pdf", enabled=True)
+    path = finish_trace(trace)
+    assert resolve_trace("attention.pdf") == path
+    assert resolve_trace(path) == path
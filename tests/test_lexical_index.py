@@ -0,0 +1,35 @@
+from tools.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    "The encoder maps an input sequence to a sequence of representations.",
+    "Label smoothing of 0.1 was used during training of the encoder and decoder.",
+    "The decoder generates an output sequence one element at a time.",
+    "Dropout is applied to the output of each sub-layer.",
+]
+
+def index() -> BM25Index:
+    return BM25Index([{"type": "text", "text": text} for text in DOCUMENTS] + [{"type": "image", "text": "encoder"}])
+
+def test_bm25_ranks_rare_terms_above_common_ones():
+    bm25 = index()
+    # Images are not indexed lexically
+    assert len(bm25) == 4
+    # "smoothing" occurs once, "encoder" twice: the document with the rare term wins
+    assert bm25.search("encoder smoothing", n_results=2) == [DOCUMENTS[1], DOCUMENTS[0]]
+    assert bm25.search("dropout", n_results=5) == [DOCUMENTS[3]]
+    assert bm25.search("what is it", n_results=2) == []
+
+def test_bm25_prefers_the_shorter_of_equal_matches():
+    bm25 = BM25Index([{"type": "text", "text": "attention " + "filler " * 30},
+                      {"type": "text", "text": "attention layer"}])
+    assert bm25.search("attention", n_results=2) == ["attention layer", "attention " + "filler " * 30]
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the BLEU score of the model?") == ["bleu", "score", "model"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    lexical = ["a", "b", "c"]
+    vector = ["d", "b", "a"]
+    # a: 1/61 + 1/63, b: 2/62, d: 1/61, c: 1/63
+    assert reciprocal_rank_fusion([lexical, vector], n_results=4) == ["a", "b", "d", "c"]
+    assert reciprocal_rank_fusion([lexical, []], n_results=2) == ["a", "b"]
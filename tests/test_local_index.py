@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from tools.local_index import LocalIndex, QUANTIZATIONS
+
+def random_vectors(count: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_batched_upserts_reopen_with_every_row(tmp_path, quantization):
+    vectors = random_vectors(200)
+    ids = [str(i) for i in range(200)]
+    index = LocalIndex("batched", quantization=quantization, root=str(tmp_path))
+    for offset in range(0, 200, 64):
+        index.upsert(ids=ids[offset:offset + 64], embeddings=vectors[offset:offset + 64],
+                     documents=ids[offset:offset + 64])
+
+    reopened = LocalIndex("batched", root=str(tmp_path))
+    assert reopened.count() == 200
+    result = reopened.query(query_embeddings=vectors[[7, 150]], n_results=1)
+    assert result["ids"] == [["7"], ["150"]]
+    assert result["documents"] == [["7"], ["150"]]
+
+def test_upsert_overwrites_rows_in_place(tmp_path):
+    vectors = random_vectors(10)
+    index = LocalIndex("update", root=str(tmp_path))
+    index.upsert(ids=[str(i) for i in range(10)], embeddings=vectors)
+    index.upsert(ids=["3"], embeddings=vectors[8:9], documents=["moved"])
+
+    reopened = LocalIndex("update", root=str(tmp_path))
+    assert reopened.count() == 10
+    assert os.path.getsize(os.path.join(reopened.path, "vectors.f32")) == 10 * 16 * 4
+    assert reopened.get(ids=["3"])["documents"] == ["moved"]
+    assert set(reopened.query(query_embeddings=vectors[8:9], n_results=2)["ids"][0]) == {"3", "8"}
+
+def test_delete_compacts_and_later_upserts_append(tmp_path):
+    vectors = random_vectors(6)
+    index = LocalIndex("delete", root=str(tmp_path))
+    index.upsert(ids=[str(i) for i in range(5)], embeddings=vectors[:5], metadatas=[{"page": i % 2} for i in range(5)])
+    index.delete(where={"page": 1})
+    index.upsert(ids=["5"], embeddings=vectors[5:], metadatas=[{"page": 0}])
+
+    reopened = LocalIndex("delete", root=str(tmp_path))
+    assert reopened.get()["ids"] == ["0", "2", "4", "5"]
+    assert reopened.query(query_embeddings=vectors[5:], n_results=1)["ids"] == [["5"]]
+
+def test_torn_record_is_dropped(tmp_path):
+    vectors = random_vectors(3)
+    index = LocalIndex("torn", root=str(tmp_path))
+    index.upsert(ids=["a", "b"], embeddings=vectors[:2])
+    with open(os.path.join(index.path, "items.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"id": "c", "ro')
+
+    reopened = LocalIndex("torn", root=str(tmp_path))
+    assert reopened.count() == 2
+    reopened.upsert(ids=["c"], embeddings=vectors[2:])
+    assert LocalIndex("torn", root=str(tmp_path)).get()["ids"] == ["a", "b", "c"]
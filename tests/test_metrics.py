@@ -0,0 +1,38 @@
+import pytest
+from tools.metrics import Metrics
+
+def test_nodes_render_as_prometheus_text():
+    metrics = Metrics()
+
+    def retriever(state):
+        with metrics.timed("embedding"):
+            pass
+        metrics.record_error()
+        return state
+
+    def failing(state):
+        raise RuntimeError("boom")
+
+    with metrics.track_request() as timings:
+        metrics.instrument_node("retriever_agent", retriever)({})
+        with pytest.raises(RuntimeError):
+            metrics.instrument_node("presenter_agent", failing)({})
+    metrics.observe("rag_sql_rows_returned", 7, buckets=[0, 5, 10])
+    metrics.inc("rag_answer_cache_total", outcome='odd "label"')
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE rag_node_calls_total counter" in lines
+    assert 'rag_node_calls_total{node="retriever_agent"} 1' in lines
+    assert 'rag_node_errors_total{node="presenter_agent"} 1' in lines
+    # Errors a node handles itself are attributed to it as well
+    assert 'rag_node_errors_total{node="retriever_agent"} 1' in lines
+    assert 'rag_stage_latency_seconds_count{node="retriever_agent",stage="embedding"} 1' in lines
+    # Buckets are cumulative and end with +Inf
+    assert 'rag_sql_rows_returned_bucket{le="5"} 0' in lines
+    assert 'rag_sql_rows_returned_bucket{le="10"} 1' in lines
+    assert 'rag_sql_rows_returned_bucket{le="+Inf"} 1' in lines
+    assert "rag_sql_rows_returned_sum 7.000000" in lines
+    assert 'rag_answer_cache_total{outcome="odd \\"label\\""} 1' in lines
+
+    assert set(timings["nodes"]) == {"retriever_agent", "presenter_agent"}
+    assert set(timings["stages"]) == {"embedding"}
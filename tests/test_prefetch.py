@@ -0,0 +1,37 @@
+import threading
+import pytest
+from tools.vector_index import _prefetch
+
+def endless_batches(closed: threading.Event):
+    try:
+        batch = 0
+        while True:
+            yield [batch]
+            batch += 1
+    finally:
+        closed.set()
+
+def test_stopping_the_consumer_closes_the_producer():
+    closed = threading.Event()
+    batches = _prefetch(endless_batches(closed), maxsize=2)
+    assert next(batches) == [0]
+    batches.close()
+    assert closed.wait(timeout=5)
+
+def test_consumer_error_closes_the_producer():
+    closed = threading.Event()
+    with pytest.raises(RuntimeError):
+        for batch in _prefetch(endless_batches(closed), maxsize=2):
+            raise RuntimeError("embedding failed")
+    assert closed.wait(timeout=5)
+
+def test_producer_error_reaches_the_consumer():
+    def failing():
+        yield [1]
+        raise ValueError("bad page")
+
+    received = []
+    with pytest.raises(ValueError, match="bad page"):
+        for batch in _prefetch(failing(), maxsize=1):
+            received.append(batch)
+    assert received == [[1]]
@@ -0,0 +1,28 @@
+import sqlite3
+from agents.retriever import retriever_agent
+from handle_sql.handler_sql import ingest_db
+from tools.vector_index import build_index
+
+PDF_ITEMS = [
+    {"page": 0, "type": "text", "text": "Multi-head attention runs several attention functions in parallel."},
+    {"page": 1, "type": "text", "text": "Positional encodings add order information to the embeddings."},
+]
+
+def test_pdf_retrieval_ignores_loaded_database(tmp_path):
+    db_path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, country TEXT)")
+    conn.close()
+    schema_items, db_index = ingest_db(db_path, "shop.db")
+    pdf_index = build_index(PDF_ITEMS)
+
+    for mode in ["vector", "lexical", "hybrid"]:
+        result = retriever_agent({
+            "user_query": "What is multi-head attention?",
+            "data_items": PDF_ITEMS + schema_items,
+            "pdf_index": pdf_index,
+            "db_index": db_index,
+            "retrieval_mode": mode
+        })
+        assert "customers" not in result["context_docs"]
+        assert "Multi-head attention" in result["context_docs"]
@@ -0,0 +1,43 @@
+import sqlite3
+import pytest
+from conftest import ATTENTION_PDF
+from agents.router import classify, singular
+from handle_docs.handler import iter_pdf_pages
+from handle_sql.handler_sql import schema_items
+
+@pytest.fixture(scope="module")
+def mixed_items(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("router") / "shop.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, country TEXT)")
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), "
+                 "order_date TEXT, total REAL)")
+    conn.close()
+    pdf_items = [item for batch in iter_pdf_pages(ATTENTION_PDF, workers=1) for item in batch]
+    return pdf_items + schema_items(db_path, "shop.db")
+
+@pytest.mark.parametrize("query", [
+    "How many orders were placed in each month over the last two years?",
+    "Give me the number of different countries our buyers come from",
+    "What was the first order date and the most recent one?",
+    "How many customers are there per country?",
+])
+def test_database_questions_go_to_sql(mixed_items, query):
+    # Everyday words such as "month" or "first" also occur in the paper; they must not count for it
+    assert classify(query, mixed_items)[0] == "sql_retriever_agent"
+
+@pytest.mark.parametrize("query", [
+    "What is multi-head attention?",
+    "What BLEU score does the big transformer get on English-German?",
+    "How does the paper regularize training?",
+])
+def test_document_questions_go_to_the_retriever(mixed_items, query):
+    assert classify(query, mixed_items)[0] == "retriever_agent"
+
+def test_evidence_on_both_sides_asks_the_llm(mixed_items):
+    # "attention" is specific to the paper, "customers" is a table
+    assert classify("Do customers pay attention to the order total?", mixed_items)[0] is None
+
+def test_singular_forms():
+    assert [singular(term) for term in ["orders", "countries", "addresses", "class", "id"]] == \
+        ["order", "country", "address", "class", "id"]
@@ -0,0 +1,30 @@
+import sqlite3
+import tools.vector_index as vector_index
+from handle_sql.handler_sql import ingest_db
+
+def test_unchanged_schema_is_not_embedded_again(tmp_path, monkeypatch):
+    embedded = []
+    add_embeddings = vector_index.add_embeddings
+    def spy(collection, items):
+        embedded.append(len(items))
+        return add_embeddings(collection, items)
+    monkeypatch.setattr(vector_index, "add_embeddings", spy)
+
+    db_path = str(tmp_path / "crm.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE accounts (id INTEGER PRIMARY KEY, owner TEXT)")
+    conn.commit()
+    _, first = ingest_db(db_path, "crm.db")
+    assert len(embedded) == 1 and first["complete"]
+
+    _, again = ingest_db(db_path, "crm.db")
+    assert len(embedded) == 1
+    assert again == first
+
+    conn.execute("CREATE TABLE contacts (id INTEGER PRIMARY KEY, account_id INTEGER REFERENCES accounts(id))")
+    conn.commit()
+    conn.close()
+    items, changed = ingest_db(db_path, "crm.db")
+    assert len(embedded) == 2
+    assert changed["fingerprint"] != first["fingerprint"]
+    assert changed["count"] == len([item for item in items if item.get("text")])
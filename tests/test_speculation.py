@@ -0,0 +1,25 @@
+import sqlite3
+import agents.sql_retriever as sql_retriever
+from agents.speculation import Speculation
+from handle_sql.handler_sql import ingest_db
+
+def test_losing_sql_branch_skips_the_llm(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL)")
+    conn.close()
+    schema_items, db_index = ingest_db(db_path, "shop.db")
+
+    calls = []
+    monkeypatch.setattr(sql_retriever, "generate_sql_query", lambda *args: calls.append(args) or "SELECT 1")
+    state = {"user_query": "How many orders are there?", "data_items": schema_items, "db_index": db_index}
+
+    lost = Speculation()
+    lost.decide("retriever_agent")
+    result = sql_retriever.sql_retriever_agent({**state, "speculation": lost})
+    assert calls == [] and result["sql_query"] is None
+
+    won = Speculation()
+    won.decide("sql_retriever_agent")
+    result = sql_retriever.sql_retriever_agent({**state, "speculation": won})
+    assert len(calls) == 1 and result["sql_query"] == "SELECT 1"
@@ -0,0 +1,39 @@
+from tools.sql_cache import SQLCache, templatize
+
+QUESTION = "Customers from 'USA' with more than 5 orders"
+SQL = "SELECT name FROM customers WHERE country = 'USA' AND order_count > 5"
+
+def make_cache(tmp_path) -> SQLCache:
+    cache = SQLCache(cache_dir=str(tmp_path))
+    cache.put(QUESTION, "schema", "model", SQL, "customers(name, country, order_count)")
+    return cache
+
+def test_templatize_types_literals():
+    template, literals = templatize("Orders of \"ACME\" since 2024-01-31 above 99.5")
+    assert template == "orders of <str> since <str> above <num>"
+    assert literals == [("str", "ACME"), ("str", "2024-01-31"), ("num", "99.5")]
+
+def test_template_hit_fills_the_new_literals(tmp_path):
+    cache = make_cache(tmp_path)
+    hit = cache.get("customers from 'France' with more than 12 orders", "schema", "model")
+    assert hit["sql"] == "SELECT name FROM customers WHERE country = 'France' AND order_count > 12"
+
+def test_filled_strings_escape_quotes(tmp_path):
+    cache = make_cache(tmp_path)
+    hit = cache.get("Customers from \"Cote d'Ivoire\" with more than 5 orders", "schema", "model")
+    assert hit["sql"] == "SELECT name FROM customers WHERE country = 'Cote d''Ivoire' AND order_count > 5"
+
+def test_no_hits_across_literal_kinds_or_values(tmp_path):
+    cache = make_cache(tmp_path)
+    # A number where the cached question had a string fits another template
+    assert cache.get("Customers from 7 with more than 5 orders", "schema", "model") is None
+    # Literal case matters: 'usa' is a different value, filled into the template rather than served exactly
+    assert cache.get("Customers from 'usa' with more than 5 orders", "schema", "model")["sql"] == \
+        "SELECT name FROM customers WHERE country = 'usa' AND order_count > 5"
+
+def test_ambiguous_sql_is_cached_exactly_only(tmp_path):
+    cache = SQLCache(cache_dir=str(tmp_path))
+    # 5 occurs twice in the SQL, so the slot of the literal is unknown
+    cache.put("Orders with 5 items", "schema", "model", "SELECT id FROM orders WHERE items = 5 LIMIT 5", "orders")
+    assert cache.get("orders with 5  items", "schema", "model")["sql"] == "SELECT id FROM orders WHERE items = 5 LIMIT 5"
+    assert cache.get("Orders with 6 items", "schema", "model") is None
@@ -0,0 +1,16 @@
+from conftest import ATTENTION_PDF
+from handle_docs.tables import TableExtractor, TABLE_BACKEND
+
+def count_tables(backend: str) -> int:
+    with TableExtractor(ATTENTION_PDF, backend=backend) as extractor:
+        return sum(len(extractor.extract(page_num)) for page_num in range(len(extractor._doc)))
+
+def test_default_backend_finds_every_table():
+    # pdfplumber finds all 10 tables in the paper; PyMuPDF's find_tables() only 6
+    assert count_tables(TABLE_BACKEND) == 10
+
+def test_pdfplumber_pages_are_released_after_extraction():
+    with TableExtractor(ATTENTION_PDF, backend="pdfplumber", prefilter=False) as extractor:
+        extractor.extract(4)
+        # A parsed page keeps its layout objects cached until it is closed
+        assert "_objects" not in vars(extractor._plumber.pages[4])
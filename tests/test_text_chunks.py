@@ -0,0 +1,46 @@
+import pymupdf
+from handle_docs.text_chunks import DocumentChunker, page_blocks
+
+# Chunks adding fewer new characters than this (beyond their overlap with the previous chunk) are fragments
+FRAGMENT_CHARS = 200
+
+def build_flowing_document(pages: int, lines_per_page: int = 28, line_chars: int = 95):
+    """
+    Paragraphs of distinct sentences laid out line by line, continuing across page breaks.
+    """
+    words = []
+    for i in range(pages * lines_per_page * 2):
+        words.extend(f"Sentence {i} reports that measurement {i * 7 % 101} improved step {i % 13} of the run.".split())
+    doc = pymupdf.open()
+    page, line, text = None, 0, ""
+    for word in words:
+        if len(text) + len(word) + 1 <= line_chars:
+            text = f"{text} {word}".strip()
+            continue
+        if page is None or line == lines_per_page:
+            if page is not None and len(doc) == pages:
+                break
+            page, line = doc.new_page(), 0
+        # A blank line every 9 lines starts a new paragraph (layout block)
+        y = 60 + line * 16 + (line // 9) * 10
+        page.insert_text((50, y), text, fontsize=9)
+        line, text = line + 1, word
+    return doc
+
+def fragments(chunks) -> int:
+    count = 0
+    for previous, chunk in zip([""] + chunks, chunks):
+        shared = next((k for k in range(min(len(previous), len(chunk)), 0, -1) if previous.endswith(chunk[:k])), 0)
+        count += len(chunk) - shared < FRAGMENT_CHARS
+    return count
+
+def test_run_on_paragraphs_leave_no_page_tail_fragments():
+    doc = build_flowing_document(10)
+    chunker = DocumentChunker()
+    items = [item for page_num, page in enumerate(doc) for item in chunker.feed(page_num, [block[4] for block in page_blocks(page)])]
+    chunks = [item["text"] for item in items]
+
+    # Only the end of the document may leave a short last chunk
+    assert fragments(chunks) == 0
+    assert any(len(item.get("pages", [])) > 1 for item in items)
+    assert all(len(chunk) <= chunker.chunk_size for chunk in chunks)
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from tools.metrics import metrics
+from tools.sql_cache import templatize
+
+# Serve answers to repeated questions about the same document (set to 0 to turn off)
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") != "0"
+# Cosine similarity a new query's embedding needs with a cached query's to reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def _literals(query: str) -> List[str]:
+    return [value for _, value in templatize(query)[1]]
+
+class AnswerCache:
+    """
+    Final answers keyed by document version and query, matched exactly or by meaning.
+
+    A query is first looked up by its normalized text, which needs no
+    embedding. Otherwise its embedding is compared with those of cached
+    queries for the same document version with the same literals (numbers,
+    quoted strings, dates), and the closest one at or above the threshold is
+    reused. Questions differing only in a literal embed almost identically
+    but need different answers, so they never match by meaning. Entries expire after ttl seconds, and the least
+    recently used ones are evicted beyond max_entries. Uploading or deleting a
+    document clears the cache.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (version, normalized query) -> entry
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get_exact(self, version: str, query: str) -> Optional[Dict[str, Any]]:
+        key = (version, _normalize(query))
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        metrics.inc("rag_answer_cache_total", outcome="exact_hit")
+        return entry["answer"]
+
+    def get_similar(self, version: str, query: str, embedding: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+        if embedding is None:
+            metrics.inc("rag_answer_cache_total", outcome="miss")
+            return None
+        literals = _literals(query)
+        with self._lock:
+            self._expire(time.time())
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if key[0] == version and entry["embedding"] is not None and entry["literals"] == literals]
+        best_key, best_answer, best_score = None, None, self.threshold
+        if candidates:
+            query = np.asarray(embedding, dtype=np.float32)
+            matrix = np.stack([entry["embedding"] for _, entry in candidates])
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            scores = matrix @ query / np.maximum(norms, 1e-12)
+            best = int(np.argmax(scores))
+            if scores[best] >= best_score:
+                best_key, best_answer = candidates[best][0], candidates[best][1]["answer"]
+        if best_key is None:
+            metrics.inc("rag_answer_cache_total", outcome="miss")
+            return None
+        with self._lock:
+            if best_key in self._entries:
+                self._entries.move_to_end(best_key)
+        metrics.inc("rag_answer_cache_total", outcome="semantic_hit")
+        return best_answer
+
+    def put(self, version: str, query: str, embedding: Optional[List[float]], answer: Dict[str, Any]):
+        key = (version, _normalize(query))
+        entry = {
+            "answer": answer,
+            "embedding": np.asarray(embedding, dtype=np.float32) if embedding is not None else None,
+            "literals": _literals(query),
+            "created": time.time()
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Global answer cache instance
+answer_cache = AnswerCache()
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from typing import Iterator, Set
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "./data/blobs")
+# Blobs stored or re-stored more recently than this are never garbage-collected,
+# since an ingest still in progress may not have recorded its references yet
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", "600"))
+
+class BlobStore:
+    """
+    Content-addressed on-disk store for binary payloads such as rendered images.
+
+    Blobs are named by the SHA-256 of their bytes, so identical payloads are
+    stored once. Reads are memory-mapped rather than copied into Python memory.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_DIR):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def _store(self, digest: str, write) -> str:
+        path = self._path(digest)
+        if os.path.exists(path):
+            # Reused by a new ingest: restart its garbage-collection grace period
+            os.utime(path)
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so concurrent writers never expose a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return digest
+
+    def put(self, data: bytes) -> str:
+        """
+        Store bytes and return their digest, which serves as the blob reference.
+        """
+        def write(temp_path):
+            with open(temp_path, "wb") as f:
+                f.write(data)
+
+        return self._store(hashlib.sha256(data).hexdigest(), write)
+
+    def put_file(self, filepath: str) -> str:
+        """
+        Store the contents of a file without reading it into memory all at once.
+        """
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return self._store(digest.hexdigest(), lambda temp_path: shutil.copyfile(filepath, temp_path))
+
+    def path(self, digest: str) -> str:
+        """
+        Return the filesystem path of a stored blob, for libraries that open files themselves.
+        """
+        return self._path(digest)
+
+    def open(self, digest: str) -> mmap.mmap:
+        """
+        Memory-map a blob read-only. The caller should close the returned map.
+        """
+        with open(self._path(digest), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, digest: str) -> bytes:
+        with self.open(digest) as data:
+            return data[:]
+
+    def b64(self, digest: str) -> str:
+        """
+        Return the blob base64-encoded, for APIs that take images as base64 text.
+        """
+        with self.open(digest) as data:
+            return base64.b64encode(data).decode("utf-8")
+
+    def digests(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for shard in sorted(os.listdir(self.root)):
+            shard_dir = os.path.join(self.root, shard)
+            if os.path.isdir(shard_dir):
+                for name in sorted(os.listdir(shard_dir)):
+                    # Skip temp files of writes in progress
+                    if name.startswith(shard):
+                        yield name
+
+    def collect_garbage(self, referenced: Set[str], grace: float = BLOB_GC_GRACE) -> int:
+        """
+        Delete the blobs not in referenced, except those stored within the last grace seconds.
+        Returns the number of blobs deleted.
+        """
+        cutoff = time.time() - grace
+        deleted = 0
+        for digest in list(self.digests()):
+            if digest in referenced:
+                continue
+            path = self._path(digest)
+            try:
+                if os.path.getmtime(path) <= cutoff:
+                    os.unlink(path)
+                    deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+
+# Global blob store instance
+blob_store = BlobStore()
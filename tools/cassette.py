@@ -0,0 +1,204 @@
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+# "off" (default), "record" (call the services and save every exchange) or "replay" (serve saved exchanges)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "./data/cassettes/default.jsonl.gz")
+# Replay delay: "recorded" (as captured), "none", or a fixed number of seconds per call
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "recorded")
+CASSETTE_MODES = ["off", "record", "replay"]
+
+class CassetteMiss(KeyError):
+    """
+    Raised in replay mode for a request that was never recorded.
+    """
+
+def _request_key(kind: str, request: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps([kind, request], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _pack_vector(vector: Optional[List[float]]) -> Optional[str]:
+    # float32 bytes in base64 are about a quarter the size of JSON numbers
+    if vector is None:
+        return None
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+def _unpack_vector(packed: Optional[str]) -> Optional[List[float]]:
+    if packed is None:
+        return None
+    return np.frombuffer(base64.b64decode(packed), dtype=np.float32).tolist()
+
+class Cassette:
+    """
+    Records LLM and embedding exchanges to a gzipped JSONL file and replays them.
+
+    Each entry stores the request (images only by hash), the response and the
+    measured latency. Requests are matched by content. A request made several
+    times replays its recordings in order, and the last one is repeated after
+    that. Replay can sleep for the recorded latency, for a fixed time or not at
+    all, so workflow runs can be timed without network variance.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = CASSETTE_MODE, latency: str = CASSETTE_LATENCY):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode} (expected one of {CASSETTE_MODES})")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, deque] = defaultdict(deque)
+        self._loaded = False
+        self._file = None
+        self.recorded = 0
+        self.replayed = 0
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"Cassette not found: {self.path} (record one with CASSETTE_MODE=record)")
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                try:
+                    for line in f:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+                except (EOFError, json.JSONDecodeError):
+                    # A recording cut short keeps every complete entry before the cut
+                    pass
+            self._loaded = True
+
+    def _delay(self, entry: Dict[str, Any]):
+        if self.latency == "none":
+            return
+        seconds = entry.get("latency", 0.0) if self.latency == "recorded" else float(self.latency)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # Each recording session appends a gzip member; readers see one continuous stream
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+                atexit.register(self.close)
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def call(self, kind: str, request: Dict[str, Any], live, pack=None, unpack=None):
+        """
+        Run live() (record mode) or look up its recorded response (replay mode).
+        pack and unpack convert the response to and from its stored form.
+        """
+        key = _request_key(kind, request)
+        if self.mode == "replay":
+            self._load()
+            with self._lock:
+                recordings = self._entries.get(key)
+                if not recordings:
+                    raise CassetteMiss(f"No recorded {kind} response in {self.path} for this request")
+                entry = recordings.popleft() if len(recordings) > 1 else recordings[0]
+                self.replayed += 1
+            self._delay(entry)
+            return unpack(entry["response"]) if unpack else entry["response"]
+
+        start = time.perf_counter()
+        response = live()
+        latency = time.perf_counter() - start
+        if self.mode == "record":
+            self._write({
+                "kind": kind,
+                "key": key,
+                "request": request,
+                "response": pack(response) if pack else response,
+                "latency": round(latency, 6)
+            })
+        return response
+
+class CassetteLLM:
+    """
+    Stands in for a chat model: invoke() goes through the cassette and returns
+    a message with .content. The real model is only created when recording.
+    """
+
+    def __init__(self, cassette: Cassette, model_name: str, factory):
+        self.cassette = cassette
+        self.model_name = model_name
+        self._factory = factory
+        self._llm = None
+
+    def invoke(self, prompt, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        def live():
+            if self._llm is None:
+                self._llm = self._factory()
+            response = self._llm.invoke(prompt, **kwargs)
+            return {"content": response.content, "usage": getattr(response, "usage_metadata", None)}
+
+        response = self.cassette.call("llm", {"model": self.model_name, "prompt": prompt}, live)
+        if isinstance(response, str):
+            # Recordings made before token usage was stored hold only the content
+            return AIMessage(content=response)
+        return AIMessage(content=response["content"], usage_metadata=response.get("usage"))
+
+class CassetteEmbeddingProvider:
+    """
+    Wraps an embedding provider so its calls go through the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, provider):
+        self.cassette = cassette
+        self.provider = provider
+        self.model_id = provider.model_id
+        # Replayed calls never reach the service, so they need no rate limiting
+        self.remote = provider.remote and cassette.mode != "replay"
+
+    def is_throttled(self, error: Exception) -> bool:
+        return self.provider.is_throttled(error)
+
+    def embed(self, prompt: Optional[str] = None, image: Optional[str] = None) -> Optional[List[float]]:
+        request = {
+            "model": self.model_id,
+            "prompt": prompt,
+            "image_sha256": hashlib.sha256(image.encode("ascii")).hexdigest() if image else None
+        }
+        return self.cassette.call("embedding", request, lambda: self.provider.embed(prompt=prompt, image=image),
+                                  pack=_pack_vector, unpack=_unpack_vector)
+
+# Global cassette instance
+cassette = Cassette()
+
+if __name__ == "__main__":
+    # Usage: python -m tools.cassette [path]  (summarize a recording)
+    path = sys.argv[1] if len(sys.argv) > 1 else CASSETTE_PATH
+    counts: Dict[str, int] = defaultdict(int)
+    latencies: Dict[str, float] = defaultdict(float)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            counts[entry["kind"]] += 1
+            latencies[entry["kind"]] += entry.get("latency", 0.0)
+    for kind in sorted(counts):
+        print(f"{kind:<10} {counts[kind]:>6} calls {latencies[kind]:>9.2f}s recorded "
+              f"({latencies[kind] / counts[kind] * 1000:.0f} ms avg)")
@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+# Documents stored for image items are placeholders, not the embedded input
+IMAGE_PLACEHOLDER = re.compile(r"^Image from page \d+$")
+
+def cache_key(model_id: str, prompt: Optional[str] = None, image: Optional[str] = None, image_bytes=None) -> str:
+    """
+    Build a content-addressed key from the model id and the raw input.
+    Images are hashed on their decoded bytes (given as base64 text or as any
+    bytes-like object), so both forms of the same image share a key.
+    """
+    digest = hashlib.sha256(model_id.encode("utf-8"))
+    digest.update(b"\x00text\x00")
+    if prompt:
+        digest.update(prompt.encode("utf-8"))
+    digest.update(b"\x00image\x00")
+    if image:
+        digest.update(base64.b64decode(image))
+    elif image_bytes is not None:
+        digest.update(image_bytes)
+    return digest.hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache backed by SQLite.
+
+    Vectors are stored as raw float32 bytes. When the total stored size exceeds
+    the configured limit, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str = EMBEDDING_CACHE_DIR, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "embeddings.sqlite3"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Return the cached embedding for a key, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def put(self, key: str, embedding: List[float]):
+        """
+        Store an embedding, evicting old entries if the cache is over its size limit.
+        """
+        if not self.enabled:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT nbytes FROM embeddings WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                (key, vector, len(vector), time.time())
+            )
+            self._total_bytes += len(vector) - (row[0] if row else 0)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        while self._total_bytes > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT key, nbytes FROM embeddings ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                self._total_bytes = 0
+                return
+            for key, nbytes in oldest:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._total_bytes -= nbytes
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the current size of the cache.
+        """
+        if not self.enabled:
+            return {"enabled": False, "hits": self.hits, "misses": self.misses}
+
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "enabled": True,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def warm_from_chroma(self, persist_directory: str, model_id: str, assume_model: Optional[str] = None) -> int:
+        """
+        Seed the cache with the text embeddings already stored in a Chroma directory.
+        Only collections whose embedding_model is model_id are read; vectors from
+        another model would be served under the wrong key. Collections created
+        before the model was recorded (e.g. rag_collection) have no label and
+        are read as built with assume_model, when given. Image entries are
+        skipped because Chroma only holds a placeholder document for them.
+        """
+        import chromadb
+
+        client = chromadb.PersistentClient(path=persist_directory)
+        added = 0
+        for collection in client.list_collections():
+            if isinstance(collection, str):
+                collection = client.get_collection(collection)
+            if (collection.metadata or {}).get("embedding_model", assume_model) != model_id:
+                continue
+            offset = 0
+            while True:
+                batch = collection.get(
+                    include=["documents", "embeddings", "metadatas"],
+                    limit=500,
+                    offset=offset
+                )
+                ids = batch.get("ids") or []
+                if not ids:
+                    break
+                metadatas = batch.get("metadatas") or [None] * len(ids)
+                for document, embedding, metadata in zip(batch["documents"], batch["embeddings"], metadatas):
+                    if not document or embedding is None:
+                        continue
+                    if (metadata or {}).get("type") == "image" or IMAGE_PLACEHOLDER.match(document):
+                        continue
+                    self.put(cache_key(model_id, prompt=document), embedding)
+                    added += 1
+                offset += len(ids)
+        return added
+
+# Global cache instance
+embedding_cache = EmbeddingCache()
+
+if __name__ == "__main__":
+    # Usage: python -m tools.embedding_cache [stats | warm [<chroma_dir>] [--assume-model <model_id>]]
+    # --assume-model names the model that built collections with no recorded embedding_model
+    from tools.embeddings import embedding_engine, CHROMA_DIR
+
+    args = sys.argv[1:]
+    assume_model = None
+    if "--assume-model" in args:
+        position = args.index("--assume-model")
+        assume_model = args[position + 1]
+        del args[position:position + 2]
+    command = args[0] if args else "stats"
+    if command == "warm":
+        chroma_dir = args[1] if len(args) > 1 else CHROMA_DIR
+        warmed = embedding_cache.warm_from_chroma(chroma_dir, embedding_engine.model_id, assume_model=assume_model)
+        print(f"Warmed {warmed} embeddings from {chroma_dir}")
+    print(embedding_cache.stats())
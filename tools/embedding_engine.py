@@ -0,0 +1,178 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from tools.embedding_cache import embedding_cache, cache_key
+from tools.embedding_providers import get_provider, BedrockProvider
+from tools.cassette import cassette, CassetteEmbeddingProvider
+from tools.blob_store import blob_store
+
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+EMBEDDING_MAX_RPS = float(os.getenv("EMBEDDING_MAX_RPS", "20"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+class AdaptiveRateLimiter:
+    """
+    Spaces requests to stay under a request rate that adapts to throttling.
+
+    The allowed rate is halved whenever the service throttles us and grows back
+    additively towards the configured maximum on each success.
+    """
+
+    def __init__(self, max_rps: float, min_rps: float = 0.5):
+        self.max_rps = max_rps
+        self.min_rps = min(min_rps, max_rps) if max_rps > 0 else min_rps
+        self.rate = max_rps
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.max_rps <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def on_success(self):
+        if self.max_rps <= 0:
+            return
+        with self._lock:
+            self.rate = min(self.max_rps, self.rate + self.max_rps * 0.05)
+
+    def on_throttle(self):
+        if self.max_rps <= 0:
+            return
+        with self._lock:
+            self.rate = max(self.min_rps, self.rate / 2)
+
+class EmbeddingEngine:
+    """
+    Embeds many inputs concurrently through one embedding provider (see
+    tools.embedding_providers; EMBEDDING_PROVIDER selects it).
+
+    Cached inputs are served from the embedding cache, identical inputs are only
+    sent once, and results are returned in the same order as the inputs.
+    Remote providers are rate limited and retried on throttling.
+    """
+
+    def __init__(self, max_workers: int = EMBEDDING_CONCURRENCY, max_rps: float = EMBEDDING_MAX_RPS,
+                 max_retries: int = EMBEDDING_MAX_RETRIES, provider=None):
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.rate_limiter = AdaptiveRateLimiter(max_rps)
+        self._provider = provider
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def provider(self):
+        with self._lock:
+            if self._provider is None:
+                self._provider = get_provider()
+                if isinstance(self._provider, BedrockProvider):
+                    self._provider.max_pool_connections = self.max_workers
+                if cassette.active:
+                    self._provider = CassetteEmbeddingProvider(cassette, self._provider)
+            return self._provider
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifies the embedding space; part of cache keys and index fingerprints.
+        """
+        return self.provider.model_id
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding")
+            return self._executor
+
+    def _invoke(self, prompt: Optional[str] = None, image: Optional[str] = None,
+                image_ref: Optional[str] = None) -> Optional[List[float]]:
+        provider = self.provider
+        if not image and image_ref:
+            # Encode blob-store images only when they are actually sent
+            image = blob_store.b64(image_ref)
+
+        for attempt in range(self.max_retries + 1):
+            if provider.remote:
+                self.rate_limiter.acquire()
+            try:
+                embedding = provider.embed(prompt=prompt, image=image)
+                if provider.remote:
+                    self.rate_limiter.on_success()
+                return embedding
+            except Exception as e:
+                if not provider.is_throttled(e) or attempt == self.max_retries:
+                    print(f"Couldn't invoke {provider.model_id} embedding model. Error: {str(e)}")
+                    return None
+                self.rate_limiter.on_throttle()
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(20.0, 0.5 * 2 ** attempt)))
+        return None
+
+    def embed(self, prompt: Optional[str] = None, image: Optional[str] = None) -> Optional[List[float]]:
+        """
+        Embed a single text and/or image input.
+        """
+        return self.embed_many([{"prompt": prompt, "image": image}])[0]
+
+    def embed_many(self, inputs: List[Dict[str, Any]]) -> List[Optional[List[float]]]:
+        """
+        Embed a list of inputs, each a dict with a "prompt" and/or an image given
+        either as base64 "image" text or as a blob store "image_ref".
+        Returns one embedding (or None on failure) per input, in input order.
+        """
+        results: List[Optional[List[float]]] = [None] * len(inputs)
+        model_id = self.model_id
+        # Cassette runs bypass the cache, so every run makes (and times) the same calls
+        use_cache = not cassette.active
+        pending: Dict[str, Dict[str, Any]] = {}
+
+        for i, inputs_item in enumerate(inputs):
+            prompt = inputs_item.get("prompt")
+            image = inputs_item.get("image")
+            image_ref = inputs_item.get("image_ref")
+            if not prompt and not image and not image_ref:
+                continue
+            if image_ref and not image:
+                with blob_store.open(image_ref) as image_bytes:
+                    key = cache_key(model_id, prompt=prompt, image_bytes=image_bytes)
+            else:
+                key = cache_key(model_id, prompt=prompt, image=image)
+            if key in pending:
+                pending[key]["positions"].append(i)
+                continue
+            cached = embedding_cache.get(key) if use_cache else None
+            if cached is not None:
+                results[i] = cached
+                continue
+            pending[key] = {"prompt": prompt, "image": image, "image_ref": image_ref, "positions": [i]}
+
+        if not pending:
+            return results
+
+        futures = {
+            key: self.executor.submit(self._invoke, request["prompt"], request["image"], request["image_ref"])
+            for key, request in pending.items()
+        }
+        for key, future in futures.items():
+            embedding = future.result()
+            if embedding is None:
+                continue
+            if use_cache:
+                embedding_cache.put(key, embedding)
+            for position in pending[key]["positions"]:
+                results[position] = embedding
+
+        return results
+
+# Global engine instance
+embedding_engine = EmbeddingEngine()
@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Dict, Optional
+import numpy as np
+
+# "bedrock" (Titan multimodal, default), "hashing" (deterministic, offline) or "sentence-transformers" (on-CPU model)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "bedrock")
+# Output size of the hashing provider; matches Titan multimodal embeddings
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+# Model used by the sentence-transformers provider
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class BedrockProvider:
+    """
+    Amazon Titan multimodal embeddings on Bedrock. Remote, so the engine rate
+    limits and retries its calls.
+    """
+    model_id = "amazon.titan-embed-image-v1"
+    region_name = "us-west-2"
+    remote = True
+    throttling_errors = ["ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"]
+
+    def __init__(self, max_pool_connections: int = 10):
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # One client shared by all threads; boto3 clients are thread-safe
+        with self._lock:
+            if self._client is None:
+                import boto3
+                from botocore.config import Config
+                # Use environment variables for security (don't hardcode credentials)
+                self._client = boto3.client(
+                    service_name="bedrock-runtime",
+                    region_name=self.region_name,
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    config=Config(max_pool_connections=self.max_pool_connections, retries={"max_attempts": 0})
+                )
+            return self._client
+
+    def is_throttled(self, error: Exception) -> bool:
+        from botocore.exceptions import ClientError
+        return isinstance(error, ClientError) and \
+            error.response.get("Error", {}).get("Code", "") in self.throttling_errors
+
+    def embed(self, prompt: Optional[str] = None, image: Optional[str] = None) -> Optional[List[float]]:
+        body = {}
+        if prompt:
+            body["inputText"] = prompt
+        if image:
+            body["inputImage"] = image
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            accept="application/json",
+            contentType="application/json"
+        )
+        return json.loads(response.get("body").read()).get("embedding")
+
+class HashingProvider:
+    """
+    Deterministic offline embeddings of the same shape as Titan's.
+
+    Text is embedded as signed hashed features of its words and word bigrams,
+    so texts sharing vocabulary land close together. Images map to a
+    pseudo-random unit vector seeded by a hash of their bytes. No network or
+    model weights are needed, which makes ingest and query runs reproducible
+    for profiling and regression tests.
+    """
+    remote = False
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.model_id = f"local-hashing-{dimension}"
+
+    def is_throttled(self, error: Exception) -> bool:
+        return False
+
+    def _text_vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if (digest >> 63) else -1.0
+        return vector
+
+    def _image_vector(self, image: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(base64.b64decode(image)).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+
+    def embed(self, prompt: Optional[str] = None, image: Optional[str] = None) -> Optional[List[float]]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        if prompt:
+            vector += self._text_vector(prompt)
+        if image:
+            vector += self._image_vector(image)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+class SentenceTransformerProvider:
+    """
+    Text embeddings from a sentence-transformers model running on the CPU.
+    Requires the optional sentence-transformers package; images are not supported.
+    """
+    remote = False
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.model_id = f"sentence-transformers:{model_name}"
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise ImportError("EMBEDDING_PROVIDER=sentence-transformers needs the sentence-transformers package") from e
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+            return self._model
+
+    def is_throttled(self, error: Exception) -> bool:
+        return False
+
+    def embed(self, prompt: Optional[str] = None, image: Optional[str] = None) -> Optional[List[float]]:
+        if not prompt:
+            return None
+        return self.model.encode(prompt, normalize_embeddings=True).tolist()
+
+EMBEDDING_PROVIDERS: Dict[str, type] = {
+    "bedrock": BedrockProvider,
+    "hashing": HashingProvider,
+    "sentence-transformers": SentenceTransformerProvider,
+}
+
+def get_provider(name: str = EMBEDDING_PROVIDER):
+    """
+    Create the embedding provider registered under name.
+    """
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name} (expected one of {list(EMBEDDING_PROVIDERS)})")
+    return EMBEDDING_PROVIDERS[name]()
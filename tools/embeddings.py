@@ -1,105 +1,91 @@
-import boto3
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
-from langchain_chroma import Chroma
+from typing import List, Dict, Any, Optional, Tuple
+from tools.embedding_engine import embedding_engine
+from tools.metrics import metrics
+from tools.ingest_trace import span
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./data/chroma")
 
 def generate_multimodal_embeddings(prompt=None, image=None):
-    try:
-        # Use environment variables for security (don't hardcode credentials)
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        
-        client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name="us-west-2",
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-        )
-        model_id = "amazon.titan-embed-image-v1"
-        body = {}
+    with metrics.timed("embedding"):
+        return embedding_engine.embed(prompt=prompt, image=image)
 
-        if prompt:
-            body["inputText"] = prompt
-        if image:
-            body["inputImage"] = image
+# Item types embedded from their "text" field
+TEXT_TYPES = ["text", "table", "schema"]
 
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body),
-            accept="application/json",
-            contentType="application/json"
-        )
-        result = json.loads(response.get("body").read())
-        return result.get("embedding")
-    
-    except Exception as e:
-        print(f"Couldn't invoke Titan embedding model. Error: {str(e)}")
-        return None
-    
-def get_embeddings(dataState: List[Dict[str, Any]]):
-    # Ensure the directory exists
-    os.makedirs("./data/chroma", exist_ok=True)
+def item_id(item: Dict[str, Any]) -> str:
+    """
+    Stable, content-derived vector id. Identical content on the same page maps to one vector.
+    """
+    content = item.get("text") or item.get("image_hash") or item.get("image_ref") or item.get("image", "")
+    record = json.dumps([item.get("type"), item.get("page", 0), content])
+    return hashlib.sha256(record.encode("utf-8")).hexdigest()[:32]
+
+def _embedding_request(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    item_type = item.get("type", "")
     
-    vector_store = Chroma(
-        collection_name="rag_collection",
-        persist_directory="./data/chroma"
-    )
+    if item_type in TEXT_TYPES:
+        text_content = item.get("text", "")
+        if text_content:
+            return {"prompt": text_content}
+    elif item_type == "image":
+        if item.get("image_ref"):
+            return {"image_ref": item["image_ref"]}
+        image_content = item.get("image", "")
+        if image_content:
+            return {"image": image_content}
+    return None
+
+def add_embeddings(collection, items: List[Tuple[Any, Dict[str, Any]]]) -> int:
+    """
+    Embed (id, item) pairs and upsert them into a collection. Items sharing an
+    id are embedded and stored once.
+    Returns the number of input items that now have a vector.
+    """
+    unique: Dict[str, Dict[str, Any]] = {}
+    id_counts: Dict[str, int] = {}
+
+    for item_key, item in items:
+        item_key = str(item_key)
+        if _embedding_request(item) is None:
+            continue
+        id_counts[item_key] = id_counts.get(item_key, 0) + 1
+        unique.setdefault(item_key, item)
+
+    # Embed everything concurrently; results come back in request order
+    keys = list(unique)
+    # Batches mix pages; spans name the pages they cover
+    pages = sorted({unique[key].get("page", 0) for key in keys})
+    with span("embedding", pages=pages, items=len(keys)):
+        results = embedding_engine.embed_many([_embedding_request(unique[key]) for key in keys])
 
     embeddings = []
     texts = []
     ids = []
+    metadatas = []
 
-    for i, item in enumerate(dataState):
-        item_type = item.get("type", "")
-        
-        embedding = None
-        text_content = ""
-        
-        if item_type in ["text", "table"]:
-            text_content = item.get("text", "")
-            if text_content:
-                embedding = generate_multimodal_embeddings(prompt=text_content)
-        elif item_type == "image":
-            image_content = item.get("image", "")
-            if image_content:
-                embedding = generate_multimodal_embeddings(image=image_content)
-        
+    for key, embedding in zip(keys, results):
         if embedding is not None:
+            item = unique[key]
+            text_content = item.get("text", "") if item.get("type") in TEXT_TYPES else ""
             embeddings.append(embedding)
             texts.append(text_content if text_content else f"Image from page {item.get('page', 0)}")
-            ids.append(str(i))
+            ids.append(key)
+            metadatas.append({"type": item.get("type", ""), "page": item.get("page", 0)})
 
     if embeddings and texts and ids:
         try:
-            vector_store._collection.add(
-                ids=ids,
-                documents=texts,
-                embeddings=embeddings
-            )
+            with span("upsert", pages=pages, items=len(ids)):
+                collection.upsert(
+                    ids=ids,
+                    documents=texts,
+                    embeddings=embeddings,
+                    metadatas=metadatas
+                )
         except Exception as e:
             print(f"Error adding to vector store: {e}")
+            return 0
 
-    return vector_store._collection
-
-def get_sql_embeddings(chunks):
-    chunk_embeddings = []
-    
-    for chunk in chunks:
-        result = generate_multimodal_embeddings(prompt=chunk)
-        chunk_embeddings.append(result)
-
-    ids = [str(i) for i in range(0, len(chunk_embeddings))]
-    
-    vector_store = Chroma(
-        collection_name="rag_collection",
-        persist_directory="./data/chroma"
-    )
-
-    vector_store._collection.add(
-        ids=ids,
-        documents=chunks,
-        embeddings=chunk_embeddings
-    )
-
-    return vector_store._collection
\ No newline at end of file
+    return sum(id_counts[key] for key in ids)
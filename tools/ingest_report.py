@@ -0,0 +1,166 @@
+"""
+Summarize PDF ingest traces: the slowest stages and pages of an ingest.
+
+Usage (from the repository root):
+    python -m tools.ingest_report                         (list recorded traces)
+    python -m tools.ingest_report attention.pdf [--top 10] (summarize a document's latest ingest)
+    python -m tools.ingest_report path/to/x.trace.jsonl --chrome trace.json
+    python -m tools.ingest_report --profile file.pdf --page 7
+
+Traces are written to INGEST_TRACE_DIR by every ingest (INGEST_TRACE=0 turns
+them off). --chrome converts a trace to the Chrome trace event format, which
+chrome://tracing and Perfetto can display. --profile runs cProfile over the
+extraction of a single page, to see why a pathological page is slow.
+"""
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from tools.ingest_trace import load_trace, trace_path, INGEST_TRACE_DIR
+
+def stage_totals(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"seconds": 0.0, "count": 0, "max": 0.0})
+    for record in spans:
+        total = totals[record["stage"]]
+        total["seconds"] += record["duration"]
+        total["count"] += 1
+        total["max"] = max(total["max"], record["duration"])
+    return dict(totals)
+
+def page_totals(spans: List[Dict[str, Any]]) -> Dict[int, Dict[str, float]]:
+    """
+    Seconds per page and stage. Batch spans (embedding, upsert) are split evenly over the pages they cover.
+    """
+    pages: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for record in spans:
+        if record.get("page") is not None:
+            pages[record["page"]][record["stage"]] += record["duration"]
+        elif record.get("pages"):
+            share = record["duration"] / len(record["pages"])
+            for page_num in record["pages"]:
+                pages[page_num][record["stage"]] += share
+    return {page_num: dict(stages) for page_num, stages in pages.items()}
+
+def summarize(trace: Dict[str, Any], top: int = 10):
+    spans = trace["spans"]
+    print(f"{trace.get('document')}: {trace.get('duration', 0.0):.2f}s, {trace.get('extracted_pages', '?')} of "
+          f"{trace.get('pages', '?')} pages extracted, {trace.get('items', '?')} items, "
+          f"{trace.get('workers', '?')} worker(s)")
+    print("Stages overlap: extraction runs ahead of embedding, and worker processes run in parallel.")
+
+    print(f"\n{'stage':<16} {'total (s)':>10} {'spans':>7} {'mean (ms)':>10} {'max (ms)':>10}")
+    totals = stage_totals(spans)
+    for stage, total in sorted(totals.items(), key=lambda entry: -entry[1]["seconds"]):
+        print(f"{stage:<16} {total['seconds']:>10.3f} {total['count']:>7} "
+              f"{total['seconds'] / total['count'] * 1000:>10.1f} {total['max'] * 1000:>10.1f}")
+
+    pages = page_totals(spans)
+    slowest = sorted(pages.items(), key=lambda entry: -sum(entry[1].values()))[:top]
+    print(f"\nSlowest {len(slowest)} pages:")
+    print(f"{'page':>6} {'total (s)':>10}  stages")
+    for page_num, stages in slowest:
+        breakdown = ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in
+                              sorted(stages.items(), key=lambda entry: -entry[1]))
+        print(f"{page_num:>6} {sum(stages.values()):>10.3f}  {breakdown}")
+
+    spans_by_duration = sorted((record for record in spans if record.get("page") is not None),
+                               key=lambda record: -record["duration"])[:top]
+    print(f"\nSlowest {len(spans_by_duration)} page stages:")
+    for record in spans_by_duration:
+        print(f"  page {record['page']:>4} {record['stage']:<12} {record['duration'] * 1000:>9.1f} ms")
+
+def to_chrome(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a trace to Chrome trace events (complete events, microseconds).
+    """
+    origin = trace.get("started", 0.0)
+    events = []
+    for record in trace["spans"]:
+        args = {key: value for key, value in record.items() if key not in ["stage", "start", "duration", "pid", "thread"]}
+        events.append({
+            "name": record["stage"] if record.get("page") is None else f"{record['stage']} p{record['page']}",
+            "cat": record["stage"],
+            "ph": "X",
+            "ts": round((record["start"] - origin) * 1e6),
+            "dur": round(record["duration"] * 1e6),
+            "pid": record["pid"],
+            "tid": record["thread"],
+            "args": args
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"document": trace.get("document")}}
+
+def profile_page(filePath: str, page_num: int, top: int = 25):
+    """
+    Run cProfile over the extraction of one page (tables, images, page reference, text blocks).
+    """
+    import pymupdf
+    from handle_docs.handler import _process_page
+    from handle_docs.images import ImageDeduplicator
+    from handle_docs.tables import TableExtractor
+
+    with pymupdf.open(filePath) as doc, TableExtractor(filePath, doc=doc) as table_extractor:
+        if not 0 <= page_num < len(doc):
+            print(f"Page {page_num} is out of range (the document has {len(doc)} pages)")
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        items, blocks = _process_page(doc, filePath, page_num, table_extractor, ImageDeduplicator(), doc_ref=None)
+        profiler.disable()
+    counts = defaultdict(int)
+    for item in items:
+        counts[item.get("type")] += 1
+    print(f"Page {page_num}: {dict(counts)} items, {len(blocks)} text blocks")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+
+def resolve_trace(name: str) -> Optional[str]:
+    """
+    The trace file for a document name or, failing that, a path to a .trace.jsonl file.
+    """
+    path = trace_path(name)
+    if os.path.exists(path):
+        return path
+    # A document name such as attention.pdf can also exist as a file; only trace files are read as paths
+    if name.endswith(".trace.jsonl") and os.path.exists(name):
+        return name
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize PDF ingest traces")
+    parser.add_argument("trace", nargs="?", help="trace file, or the document name it was ingested under")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest pages and stages to show")
+    parser.add_argument("--chrome", help="write the trace in Chrome trace event format to this file")
+    parser.add_argument("--profile", metavar="PDF", help="profile the extraction of one page of this PDF")
+    parser.add_argument("--page", type=int, default=0, help="page to profile (0-based)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile_page(args.profile, args.page, top=max(args.top, 25))
+        return
+
+    if not args.trace:
+        paths = sorted(glob.glob(os.path.join(INGEST_TRACE_DIR, "*.trace.jsonl")), key=os.path.getmtime, reverse=True)
+        if not paths:
+            print(f"No traces in {INGEST_TRACE_DIR}")
+        for path in paths:
+            trace = load_trace(path)
+            print(f"{trace.get('document')!s:<40} {trace.get('duration', 0.0):>8.2f}s  {path}")
+        return
+
+    path = resolve_trace(args.trace)
+    if path is None:
+        print(f"No trace found for {args.trace}")
+        return
+    trace = load_trace(path)
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(to_chrome(trace), f)
+        print(f"Chrome trace written to {args.chrome}")
+        return
+    summarize(trace, top=args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+# Write a trace of every PDF ingest (set to 0 to turn off)
+INGEST_TRACE = os.getenv("INGEST_TRACE", "1") != "0"
+INGEST_TRACE_DIR = os.getenv("INGEST_TRACE_DIR", "./data/traces")
+
+class IngestTrace:
+    """
+    Stage spans of one ingest: per-page extraction stages (tables, text_blocks,
+    text_chunks, images, page_images) and per-batch embedding and upsert.
+
+    Spans are collected in memory from any thread and written as JSON lines at
+    the end of the ingest: a header line, then one line per span with its
+    stage, page (or pages, for batches), wall-clock start, duration and
+    process/thread ids. Worker processes collect their own spans and hand them
+    back with their results.
+    """
+
+    def __init__(self, document: Optional[str] = None):
+        self.document = document
+        self.started = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start: float, duration: float, page: Optional[int] = None, **attrs):
+        record = {"stage": stage, "page": page, "start": round(start, 6), "duration": round(duration, 6),
+                  "pid": os.getpid(), "thread": threading.current_thread().name, **attrs}
+        with self._lock:
+            self.spans.append(record)
+
+    def extend(self, spans: List[Dict[str, Any]]):
+        with self._lock:
+            self.spans.extend(spans)
+
+# Trace of the ingest running in this context, if any. Concurrent ingests each see their own;
+# threads working for an ingest must run in a copy of its context (contextvars.copy_context())
+_active: contextvars.ContextVar[Optional[IngestTrace]] = contextvars.ContextVar("ingest_trace", default=None)
+
+def start_trace(document: Optional[str] = None, enabled: bool = INGEST_TRACE) -> Optional[IngestTrace]:
+    """
+    Make a new trace the active one (or turn tracing off in this context when not enabled).
+    """
+    trace = IngestTrace(document) if enabled else None
+    _active.set(trace)
+    return trace
+
+def active_trace() -> Optional[IngestTrace]:
+    return _active.get()
+
+@contextmanager
+def span(stage: str, page: Optional[int] = None, **attrs):
+    """
+    Record the enclosed block as a span of the active trace; does nothing when no trace is active.
+    """
+    trace = _active.get()
+    if trace is None:
+        yield
+        return
+    start = time.time()
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, start, time.perf_counter() - began, page=page, **attrs)
+
+def trace_path(document: str, trace_dir: str = INGEST_TRACE_DIR) -> str:
+    # The latest ingest of a document replaces its previous trace
+    return os.path.join(trace_dir, re.sub(r"[^\w.-]", "_", document) + ".trace.jsonl")
+
+def finish_trace(trace: Optional[IngestTrace], **summary) -> Optional[str]:
+    """
+    Write the trace to its file and deactivate it. summary is stored in the header line.
+    Returns the path written, or None when tracing is off.
+    """
+    if _active.get() is trace:
+        _active.set(None)
+    if trace is None:
+        return None
+    path = trace_path(trace.document or "ingest")
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            header = {"document": trace.document, "started": round(trace.started, 6),
+                      "duration": round(time.time() - trace.started, 6), **summary}
+            f.write(json.dumps(header) + "\n")
+            for record in sorted(trace.spans, key=lambda record: record["start"]):
+                f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Error writing ingest trace: {e}")
+        return None
+    return path
+
+def load_trace(path: str) -> Dict[str, Any]:
+    """
+    Read a trace file: the header fields plus a "spans" list.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        header["spans"] = [json.loads(line) for line in f if line.strip()]
+    return header
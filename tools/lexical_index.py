@@ -0,0 +1,112 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from tools.metrics import metrics
+
+# Item types indexed lexically
+LEXICAL_TYPES = ["text", "table"]
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Number of documents' lexical indexes kept in memory
+LEXICAL_INDEX_CACHE_SIZE = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", "8"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which "
+    "who will with how why when where do does did".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring over the text and table items.
+
+    Per-posting BM25 weights are precomputed at build time, so a query is a
+    handful of vectorized adds into a score array with no remote calls.
+    """
+
+    def __init__(self, data_items: List[Dict[str, Any]], k1: float = BM25_K1, b: float = BM25_B):
+        self.documents = [item["text"] for item in data_items
+                          if item.get("type") in LEXICAL_TYPES and item.get("text")]
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = []
+        for doc_id, document in enumerate(self.documents):
+            counts = Counter(tokenize(document))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(doc_id)
+                tfs.append(tf)
+
+        n = len(self.documents)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average = float(lengths.mean()) if n else 0.0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, (docs, tfs) in postings.items():
+            docs = np.asarray(docs, dtype=np.int64)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            idf = math.log(1.0 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[docs] / max(average, 1e-9))
+            self.postings[term] = (docs, (idf * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, n_results: int = 2) -> List[str]:
+        """
+        Return the documents with the highest BM25 score for the query.
+        """
+        with metrics.timed("lexical_query"):
+            return self._search(query, n_results)
+
+    def _search(self, query: str, n_results: int) -> List[str]:
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if not terms:
+            return []
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in terms:
+            docs, weights = self.postings[term]
+            scores[docs] += weights
+        matched = np.flatnonzero(scores)
+        if len(matched) > n_results:
+            matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+        return [self.documents[i] for i in matched[np.argsort(-scores[matched], kind="stable")]]
+
+_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+_lock = threading.Lock()
+
+def lexical_index_for(handle: Optional[Dict[str, Any]], data_items: List[Dict[str, Any]]) -> BM25Index:
+    """
+    Return the lexical index for a vector index handle, building it from the data items
+    the first time. Without a handle the index is built but not cached.
+    """
+    if not handle or not handle.get("fingerprint"):
+        return BM25Index(data_items)
+    key = f"{handle['collection']}:{handle['fingerprint']}"
+    with _lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    index = BM25Index(data_items)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > LEXICAL_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+def reciprocal_rank_fusion(rankings: List[List[str]], n_results: int = 2, k: int = 60) -> List[str]:
+    """
+    Merge ranked document lists with reciprocal rank fusion (score = sum of 1 / (k + rank)).
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            scores[document] = scores.get(document, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:n_results]
@@ -1,12 +1,38 @@
 import os
 from langchain_groq import ChatGroq
+from tools.cassette import cassette, CassetteLLM
+from tools.metrics import metrics
 
-def get_llm():
+LLM_MODEL = "llama-3.3-70b-versatile"
+
+class MeteredLLM:
+    """
+    Times each invoke() as the "llm" stage of the calling node and counts its tokens.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def invoke(self, prompt, **kwargs):
+        with metrics.timed("llm"):
+            response = self.llm.invoke(prompt, **kwargs)
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage:
+            metrics.record_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        return response
+
+def _make_llm():
     # Use environment variable for API key security
     api_key = os.getenv("GROQ_API_KEY")
     
     llm = ChatGroq(
-        model="llama-3.3-70b-versatile",  # Using a more standard model
+        model=LLM_MODEL,  # Using a more standard model
         api_key=api_key
     )
     return llm
+
+def get_llm():
+    # With CASSETTE_MODE=record/replay, calls are captured to or served from the cassette
+    if cassette.active:
+        return MeteredLLM(CassetteLLM(cassette, LLM_MODEL, _make_llm))
+    return MeteredLLM(_make_llm())
@@ -0,0 +1,415 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./data/local_index")
+# "float32" (exact), "float16" or "int8"; quantized indexes rescore their candidates in float32
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "int8")
+QUANTIZATIONS = ["float32", "float16", "int8"]
+
+# Candidates fetched per requested result before float32 rescoring
+RESCORE_FACTOR = 4
+# Rows scored per block, to bound the size of the temporary score matrix
+QUERY_BLOCK_ROWS = 16384
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Chroma-style metadata filter ($eq, $ne, $in, $nin, $and, $or).
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+# Per-row data files: dtype and whether each row is a vector (True) or a scalar (False)
+ROW_FILES = {
+    "vectors.f32": (np.float32, True),
+    "vectors.f16": (np.float16, True),
+    "codes.i8": (np.int8, True),
+    "scales.f32": (np.float32, False),
+}
+
+class LocalIndex:
+    """
+    In-process vector index over a contiguous NumPy matrix.
+
+    Vectors are L2-normalized and ranked by cosine similarity using blocked,
+    vectorized dot products. Queries are batched. The float32 matrix is kept on
+    disk as raw rows and memory-mapped, so opening an index is instant. With
+    int8 or float16 quantization, candidates are scored on the compact matrix
+    and the best RESCORE_FACTOR * k are rescored exactly against the float32
+    rows.
+
+    Storage is append-only: an upsert writes only its own rows and appends one
+    record per row to items.jsonl, so building an index in batches costs time
+    proportional to its size. meta.json holds just the header (quantization,
+    dimension, collection metadata). Deletes compact the whole index into a
+    fresh directory.
+
+    Implements the subset of the Chroma collection API this app uses (upsert,
+    delete, get, query, count, modify), so it can stand in for a collection.
+    """
+
+    def __init__(self, name: str, quantization: str = LOCAL_INDEX_QUANTIZATION, root: str = LOCAL_INDEX_DIR,
+                 metadata: Optional[Dict[str, Any]] = None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {QUANTIZATIONS})")
+        self.name = name
+        self.path = os.path.join(root, name)
+        self._quantization = quantization
+        self._dimension: Optional[int] = None
+        self._ids: List[str] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._metadata: Dict[str, Any] = dict(metadata or {})
+        self._vectors = None
+        self._codes = None
+        self._scales = None
+        self._positions: Dict[str, int] = {}
+        self._load()
+
+    @classmethod
+    def exists(cls, name: str, root: str = LOCAL_INDEX_DIR) -> bool:
+        return os.path.exists(os.path.join(root, name, "meta.json"))
+
+    @classmethod
+    def names(cls, root: str = LOCAL_INDEX_DIR) -> List[str]:
+        if not os.path.isdir(root):
+            return []
+        return sorted(name for name in os.listdir(root) if cls.exists(name, root))
+
+    @classmethod
+    def drop(cls, name: str, root: str = LOCAL_INDEX_DIR) -> bool:
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            return False
+        shutil.rmtree(path)
+        return True
+
+    # -- persistence -----------------------------------------------------
+
+    def _file(self, filename: str) -> str:
+        return os.path.join(self.path, filename)
+
+    def _load(self):
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._quantization = meta["quantization"]
+        self._metadata = meta.get("metadata") or {}
+        if "ids" in meta:
+            self._migrate(meta)
+            return
+        self._dimension = meta.get("dimension")
+
+        records = 0
+        log_path = self._file("items.jsonl")
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                data = f.read()
+            if data and not data.endswith(b"\n"):
+                # Drop the torn record of an interrupted upsert, so later appends start on a fresh line
+                data = data[:data.rfind(b"\n") + 1]
+                with open(log_path, "r+b") as f:
+                    f.truncate(len(data))
+            for line in data.splitlines():
+                record = json.loads(line)
+                records += 1
+                row = record["row"]
+                if row == len(self._ids):
+                    self._ids.append(record["id"])
+                    self._documents.append(record["document"])
+                    self._metadatas.append(record["metadata"])
+                else:
+                    self._documents[row] = record["document"]
+                    self._metadatas[row] = record["metadata"]
+                self._positions[record["id"]] = row
+        self._map()
+        if records > 2 * len(self._ids) + 1024:
+            # Mostly superseded records: compact the log
+            self._rewrite(self._matrix())
+
+    def _migrate(self, meta: Dict[str, Any]):
+        # Indexes written before storage became append-only keep everything in meta.json and .npy files
+        self._ids = meta["ids"]
+        self._documents = meta["documents"]
+        self._metadatas = meta["metadatas"]
+        self._positions = {item_id: i for i, item_id in enumerate(self._ids)}
+        vectors = np.load(self._file("vectors.npy")) if self._ids else None
+        self._dimension = None if vectors is None else int(vectors.shape[1])
+        self._rewrite(vectors)
+
+    def _map(self):
+        """
+        Memory-map the first count() rows of each row file.
+        """
+        self._vectors = self._codes = self._scales = None
+        rows = len(self._ids)
+        if rows == 0:
+            return
+
+        def open_rows(filename: str):
+            dtype, is_vector = ROW_FILES[filename]
+            shape = (rows, self._dimension) if is_vector else (rows,)
+            return np.memmap(self._file(filename), dtype=dtype, mode="r", shape=shape)
+
+        self._vectors = open_rows("vectors.f32")
+        if self._quantization == "int8":
+            self._codes = open_rows("codes.i8")
+            self._scales = open_rows("scales.f32")
+        elif self._quantization == "float16":
+            self._codes = open_rows("vectors.f16")
+
+    def _row_arrays(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        What is stored per row: the float32 vector and its quantized form.
+        """
+        arrays = {"vectors.f32": vectors}
+        if self._quantization == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            arrays["codes.i8"] = np.round(vectors / scales[:, None]).astype(np.int8)
+            arrays["scales.f32"] = scales.astype(np.float32)
+        elif self._quantization == "float16":
+            arrays["vectors.f16"] = vectors.astype(np.float16)
+        return arrays
+
+    def _write_rows(self, directory: str, start: int, vectors: np.ndarray):
+        """
+        Write rows starting at row start, appending or overwriting in place.
+        """
+        for filename, rows in self._row_arrays(vectors).items():
+            path = os.path.join(directory, filename)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(start * (rows.nbytes // len(rows)))
+                f.write(np.ascontiguousarray(rows).tobytes())
+
+    def _record(self, row: int) -> str:
+        return json.dumps({
+            "id": self._ids[row],
+            "row": row,
+            "document": self._documents[row],
+            "metadata": self._metadatas[row]
+        }) + "\n"
+
+    def _write_meta(self, directory: str):
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "quantization": self._quantization,
+                "dimension": self._dimension,
+                "metadata": self._metadata
+            }, f)
+        os.replace(temp_path, os.path.join(directory, "meta.json"))
+
+    def _rewrite(self, vectors: Optional[np.ndarray]):
+        """
+        Write the whole index into a new directory and swap it in (after deletes and for compaction).
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(self.path) or ".", prefix=f".{self.name}.")
+        if vectors is not None and len(vectors):
+            self._write_rows(staging, 0, np.asarray(vectors, dtype=np.float32))
+        with open(os.path.join(staging, "items.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(self._record(row) for row in range(len(self._ids)))
+        self._write_meta(staging)
+
+        # Release the old memory maps before replacing their files
+        self._vectors = self._codes = self._scales = None
+        if os.path.isdir(self.path):
+            old = self.path + ".old"
+            if os.path.isdir(old):
+                shutil.rmtree(old)
+            os.replace(self.path, old)
+            os.replace(staging, self.path)
+            shutil.rmtree(old)
+        else:
+            os.replace(staging, self.path)
+        self._map()
+
+    def _matrix(self) -> Optional[np.ndarray]:
+        return None if self._vectors is None else np.asarray(self._vectors, dtype=np.float32)
+
+    # -- collection API --------------------------------------------------
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._metadata
+
+    def modify(self, metadata: Dict[str, Any]):
+        self._metadata = dict(metadata)
+        # Metadata-only change: rewrite the sidecar, leave the vector files alone
+        os.makedirs(self.path, exist_ok=True)
+        self._write_meta(self.path)
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None):
+        new_vectors = np.asarray(embeddings, dtype=np.float32)
+        new_vectors /= np.maximum(np.linalg.norm(new_vectors, axis=1, keepdims=True), 1e-12)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        if not len(ids):
+            return
+        if self._dimension is not None and new_vectors.shape[1] != self._dimension:
+            raise ValueError(f"Embedding dimension {new_vectors.shape[1]} does not match the index ({self._dimension})")
+
+        os.makedirs(self.path, exist_ok=True)
+        if self._dimension is None or not os.path.exists(self._file("meta.json")):
+            self._dimension = int(new_vectors.shape[1])
+            self._write_meta(self.path)
+
+        # The last occurrence of an id in the batch wins
+        latest = {item_id: i for i, item_id in enumerate(ids)}
+        start = len(self._ids)
+        appended = []
+        rows = []
+        for item_id, i in latest.items():
+            position = self._positions.get(item_id)
+            if position is None:
+                position = start + len(appended)
+                appended.append(i)
+                self._positions[item_id] = position
+                self._ids.append(item_id)
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+            else:
+                # Existing rows are overwritten in place
+                self._write_rows(self.path, position, new_vectors[i:i + 1])
+                self._documents[position] = documents[i]
+                self._metadatas[position] = metadatas[i]
+            rows.append(position)
+        if appended:
+            self._write_rows(self.path, start, new_vectors[appended])
+        # Rows are written before their records, so a record never points past the row files
+        with open(self._file("items.jsonl"), "a", encoding="utf-8") as f:
+            f.writelines(self._record(row) for row in rows)
+        self._map()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        drop = set(ids or [])
+        if where:
+            drop |= {item_id for item_id, metadata in zip(self._ids, self._metadatas) if _matches(metadata or {}, where)}
+        drop &= set(self._positions)
+        if not drop:
+            return
+        keep = [i for i, item_id in enumerate(self._ids) if item_id not in drop]
+        vectors = self._matrix()
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        self._positions = {item_id: i for i, item_id in enumerate(self._ids)}
+        self._rewrite(vectors[keep] if vectors is not None and keep else None)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+        positions = [self._positions[item_id] for item_id in ids if item_id in self._positions] if ids else range(len(self._ids))
+        positions = [i for i in positions if _matches(self._metadatas[i] or {}, where)]
+        positions = positions[(offset or 0):]
+        if limit is not None:
+            positions = positions[:limit]
+        return self._results(positions, include)
+
+    def _results(self, positions: List[int], include: List[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"ids": [self._ids[i] for i in positions]}
+        if "documents" in include:
+            result["documents"] = [self._documents[i] for i in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[i] for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [np.asarray(self._vectors[i], dtype=np.float32) for i in positions]
+        return result
+
+    def _scores(self, queries: np.ndarray, rows) -> np.ndarray:
+        """
+        Approximate (quantized) or exact scores of queries against a slice or subset of rows.
+        """
+        if self._quantization == "int8":
+            return (queries @ np.asarray(self._codes[rows], dtype=np.float32).T) * np.asarray(self._scales[rows])[None, :]
+        matrix = self._codes if self._quantization == "float16" else self._vectors
+        return queries @ np.asarray(matrix[rows], dtype=np.float32).T
+
+    def _top_k(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> List[np.ndarray]:
+        n = len(self._ids)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        total = n if allowed is None else len(allowed)
+        for start in range(0, total, QUERY_BLOCK_ROWS):
+            if allowed is None:
+                # Contiguous slices keep memory-mapped reads as views
+                rows = slice(start, min(start + QUERY_BLOCK_ROWS, n))
+                block = np.arange(rows.start, rows.stop)
+            else:
+                rows = block = allowed[start:start + QUERY_BLOCK_ROWS]
+            scores = self._scores(queries, rows)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(block, scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return [rows[np.argsort(-scores)] for rows, scores in zip(best_rows, best_scores)]
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        allowed = None
+        if where:
+            allowed = np.array([i for i, metadata in enumerate(self._metadatas) if _matches(metadata or {}, where)],
+                               dtype=np.int64)
+        available = len(self._ids) if allowed is None else len(allowed)
+        k = min(n_results, available)
+
+        results: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if k == 0:
+            results["ids"] = [[] for _ in queries]
+            results["documents"] = [[] for _ in queries]
+            results["metadatas"] = [[] for _ in queries]
+            results["distances"] = [[] for _ in queries]
+            return results
+
+        exact = self._quantization == "float32"
+        candidates = self._top_k(queries, k if exact else min(available, k * RESCORE_FACTOR), allowed)
+        for query, rows in zip(queries, candidates):
+            # Rescore quantized candidates against the float32 rows
+            scores = np.asarray(self._vectors[np.sort(rows)], dtype=np.float32) @ query
+            order = np.argsort(-scores)[:k]
+            rows = np.sort(rows)[order]
+            scores = scores[order]
+            positions = rows.tolist()
+            hit = self._results(positions, include)
+            results["ids"].append(hit["ids"])
+            results["documents"].append(hit.get("documents", []))
+            results["metadatas"].append(hit.get("metadatas", []))
+            # Cosine distance, comparable to Chroma's distances on normalized vectors
+            results["distances"].append((1.0 - scores).tolist())
+        return results
@@ -0,0 +1,172 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+# Histogram bucket upper bounds: latencies in seconds, SQL result sizes in rows
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+ROW_BUCKETS = [0, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+METRIC_HELP = {
+    "rag_node_calls_total": ("counter", "Workflow node invocations"),
+    "rag_node_errors_total": ("counter", "Workflow node invocations that raised or reported an error"),
+    "rag_node_latency_seconds": ("histogram", "Workflow node latency"),
+    "rag_stage_latency_seconds": ("histogram", "Latency of calls made inside nodes (llm, embedding, vector_query, lexical_query, sql_execution)"),
+    "rag_llm_tokens_total": ("counter", "LLM tokens by node and direction (in/out)"),
+    "rag_sql_rows_returned": ("histogram", "Rows returned by executed SQL queries"),
+    "rag_router_decisions_total": ("counter", "Supervisor routing decisions by route and source (single_source, classifier, cache, llm)"),
+    "rag_router_llm_calls_avoided_total": ("counter", "Routing decisions made without an LLM call"),
+    "rag_answer_cache_total": ("counter", "Answer cache lookups by outcome (exact_hit, semantic_hit, miss)"),
+    "rag_sql_cache_total": ("counter", "Generated SQL cache lookups by outcome (exact_hit, template_hit, miss)"),
+    "rag_speculation_branches_total": ("counter", "Speculative retrieval branches by outcome (used, discarded, cancelled)"),
+}
+
+# Node being run and timing breakdown of the request being served, per thread of execution
+_current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_node", default=None)
+_current_timings: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_timings", default=None)
+
+def _labels(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in pairs]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+class Metrics:
+    """
+    Counters and histograms for the agent workflow, rendered in the Prometheus
+    text exposition format.
+
+    Nodes are wrapped with instrument_node(); code inside a node reports the
+    calls it makes with timed() and its errors with record_error(). Both are
+    attributed to the node being run. While track_request() is active, the
+    same timings are also collected into a per-request breakdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        # (name, labels) -> [bucket counts, sum, count]
+        self._histograms: Dict[Tuple[str, Tuple], List[Any]] = {}
+        self._buckets: Dict[str, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: List[float] = LATENCY_BUCKETS, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._buckets.setdefault(name, buckets)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def _record_timing(self, section: str, name: str, seconds: float):
+        timings = _current_timings.get()
+        if timings is not None:
+            with self._lock:
+                timings[section][name] = round(timings[section].get(name, 0.0) + seconds, 6)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """
+        Time a call made inside a node (an LLM call, an embedding, a vector query...).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("rag_stage_latency_seconds", seconds, stage=stage, node=_current_node.get() or "none")
+            self._record_timing("stages", stage, seconds)
+
+    def record_error(self):
+        """
+        Count an error a node handled itself (nodes report failures in their output instead of raising).
+        """
+        self.inc("rag_node_errors_total", node=_current_node.get() or "none")
+
+    def record_tokens(self, tokens_in: int, tokens_out: int):
+        node = _current_node.get() or "none"
+        self.inc("rag_llm_tokens_total", tokens_in, node=node, direction="in")
+        self.inc("rag_llm_tokens_total", tokens_out, node=node, direction="out")
+
+    def instrument_node(self, name: str, node):
+        """
+        Wrap a workflow node so its calls, errors and latency are recorded.
+        """
+        @functools.wraps(node)
+        def wrapper(state):
+            token = _current_node.set(name)
+            start = time.perf_counter()
+            try:
+                return node(state)
+            except Exception:
+                self.inc("rag_node_errors_total", node=name)
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                _current_node.reset(token)
+                self.inc("rag_node_calls_total", node=name)
+                self.observe("rag_node_latency_seconds", seconds, node=name)
+                self._record_timing("nodes", name, seconds)
+        return wrapper
+
+    @contextmanager
+    def track_request(self):
+        """
+        Collect the node and stage timings of one request; yields the breakdown dict.
+        """
+        timings: Dict[str, Any] = {"nodes": {}, "stages": {}, "total": 0.0}
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            yield timings
+        finally:
+            timings["total"] = round(time.perf_counter() - start, 6)
+            _current_timings.reset(token)
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(value[0]), value[1], value[2]] for key, value in self._histograms.items()}
+        lines: List[str] = []
+        for name, (kind, help_text) in METRIC_HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                continue
+            buckets = self._buckets.get(name, [])
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+# Global metrics instance
+metrics = Metrics()
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+from tools.metrics import metrics
+
+SQL_CACHE_DIR = os.getenv("SQL_CACHE_DIR", "./data/sql_cache")
+# Entries kept before the least recently used are evicted (0 turns the cache off)
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "10000"))
+
+# Literals that can change between otherwise identical questions: quoted strings, ISO dates and numbers
+LITERAL = re.compile(r"'([^']*)'|\"([^\"]*)\"|(?<![\w.-])(\d{4}-\d{2}-\d{2})(?![\w.-])|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")
+
+def _normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+def _exact_question(question: str) -> str:
+    # Case and spacing are ignored except inside literals, where 'USA' and 'usa' differ
+    template, literals = templatize(question)
+    return json.dumps([template, [value for _, value in literals]])
+
+def schema_hash(schema_texts: List[str]) -> str:
+    """
+    Fingerprint of a database's whole schema text.
+    """
+    digest = hashlib.sha256()
+    for text in schema_texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def templatize(question: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Replace the literals of a question with typed placeholders.
+    Returns the normalized template and the (kind, value) literals in order.
+    """
+    literals: List[Tuple[str, str]] = []
+
+    def placeholder(match) -> str:
+        single, double, date, number = match.groups()
+        if number is not None:
+            literals.append(("num", number))
+        elif date is not None:
+            literals.append(("str", date))
+        else:
+            literals.append(("str", single if single is not None else double))
+        return f"<{literals[-1][0]}>"
+
+    return _normalize(LITERAL.sub(placeholder, question)), literals
+
+def _literal_pattern(kind: str, value: str) -> re.Pattern:
+    if kind == "num":
+        return re.compile(r"(?<![\w.])" + re.escape(value) + r"(?![\w.])")
+    # Strings keep their quotes in the template; only the value is replaced
+    return re.compile(r"(?<=(['\"]))" + re.escape(value) + r"(?=\1)")
+
+def sql_template(sql: str, literals: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Turn generated SQL into a template by replacing each question literal with
+    its slot. Returns None unless every literal occurs exactly once in the SQL
+    and the literals are distinct, since otherwise slots would be ambiguous.
+    """
+    if not literals or len({value for _, value in literals}) != len(literals):
+        return None
+    spans = []
+    for slot, (kind, value) in enumerate(literals):
+        matches = list(_literal_pattern(kind, value).finditer(sql))
+        if len(matches) != 1:
+            return None
+        spans.append((matches[0].start(), matches[0].end(), slot))
+    template = sql
+    for start, end, slot in sorted(spans, reverse=True):
+        template = template[:start] + "{{slot%d}}" % slot + template[end:]
+    return template
+
+SLOT = re.compile(r"\{\{slot(\d+)\}\}")
+
+def fill_template(template: str, literals: List[Tuple[str, str]]) -> str:
+    def value(match) -> str:
+        kind, literal = literals[int(match.group(1))]
+        if kind == "num":
+            return literal
+        # The enclosing quote is doubled inside the value, the way SQL escapes it
+        quote = template[match.start() - 1]
+        return literal.replace(quote, quote * 2)
+
+    return SLOT.sub(value, template)
+
+class SQLCache:
+    """
+    Persistent cache of generated SQL, backed by SQLite.
+
+    Entries are keyed by the question, a hash of the database's whole schema
+    and the LLM model id. A hit therefore skips both the schema lookup and the
+    LLM. Each question is stored exactly (normalized) and, when its literals
+    can be located in the SQL, as a template. A later question that differs
+    only in those literals (numbers, quoted strings, dates) reuses the
+    template with its own values filled in. SQL that fails to execute is
+    dropped with discard().
+    """
+
+    def __init__(self, cache_dir: str = SQL_CACHE_DIR, max_entries: int = SQL_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "sql.sqlite3"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sql_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, question TEXT NOT NULL, sql TEXT NOT NULL, "
+                "schema TEXT NOT NULL, hits INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sql_cache_last_used ON sql_cache (last_used)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _key(kind: str, question: str, schema_fingerprint: str, model_id: str) -> str:
+        return hashlib.sha256(json.dumps([kind, question, schema_fingerprint, model_id]).encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str, touch: bool = True) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT sql, schema FROM sql_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and touch:
+                conn.execute("UPDATE sql_cache SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+        return row
+
+    def get(self, question: str, schema_fingerprint: str, model_id: str) -> Optional[Dict[str, str]]:
+        """
+        Return {"sql", "schema"} for a question answered before, or None.
+        """
+        if not self.enabled:
+            return None
+        row = self._lookup(self._key("exact", _exact_question(question), schema_fingerprint, model_id))
+        if row is not None:
+            metrics.inc("rag_sql_cache_total", outcome="exact_hit")
+            return {"sql": row[0], "schema": row[1]}
+        template, literals = templatize(question)
+        if literals:
+            row = self._lookup(self._key("template", template, schema_fingerprint, model_id))
+            if row is not None:
+                metrics.inc("rag_sql_cache_total", outcome="template_hit")
+                return {"sql": fill_template(row[0], literals), "schema": row[1]}
+        metrics.inc("rag_sql_cache_total", outcome="miss")
+        return None
+
+    def contains(self, question: str, schema_fingerprint: str, model_id: str) -> bool:
+        """
+        Whether get() would hit, without counting a hit or refreshing the entry.
+        """
+        if not self.enabled:
+            return False
+        if self._lookup(self._key("exact", _exact_question(question), schema_fingerprint, model_id), touch=False):
+            return True
+        template, literals = templatize(question)
+        return bool(literals) and \
+            self._lookup(self._key("template", template, schema_fingerprint, model_id), touch=False) is not None
+
+    def put(self, question: str, schema_fingerprint: str, model_id: str, sql: str, schema: str):
+        """
+        Store generated SQL and the schema context it was generated from.
+        """
+        if not self.enabled:
+            return
+        entries = [("exact", _exact_question(question), sql)]
+        template, literals = templatize(question)
+        templated = sql_template(sql, literals)
+        if templated is not None:
+            entries.append(("template", template, templated))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            for kind, key_question, entry_sql in entries:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sql_cache (key, kind, question, sql, schema, hits, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                    (self._key(kind, key_question, schema_fingerprint, model_id), kind, key_question, entry_sql, schema, now)
+                )
+            excess = conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM sql_cache WHERE key IN "
+                             "(SELECT key FROM sql_cache ORDER BY last_used LIMIT ?)", (excess,))
+            conn.commit()
+
+    def discard(self, sql: str):
+        """
+        Forget cached SQL that turned out not to run (exact entries only; templates may still fit other values).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM sql_cache WHERE kind = 'exact' AND sql = ?", (sql,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM sql_cache")
+            conn.commit()
+
+# Global SQL cache instance
+sql_cache = SQLCache()
+
+if __name__ == "__main__":
+    # Usage: python -m tools.sql_cache [clear]
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        sql_cache.clear()
+        print("SQL cache cleared")
+    else:
+        conn = sql_cache._connect()
+        for kind, count, hits in conn.execute("SELECT kind, COUNT(*), SUM(hits) FROM sql_cache GROUP BY kind"):
+            print(f"{kind:<10} {count:>6} entries {hits or 0:>8} hits")
@@ -0,0 +1,373 @@
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import chromadb
+from langchain_chroma import Chroma
+from tools.embeddings import add_embeddings, item_id, CHROMA_DIR
+from tools.embedding_engine import embedding_engine
+from tools.local_index import LocalIndex
+from tools.metrics import metrics
+
+# Bump whenever the way items are embedded or stored changes, so that
+# indexes built by an older version are rebuilt instead of reused.
+INDEX_VERSION = 3
+
+EMBEDDABLE_TYPES = ["text", "table", "image"]
+
+# Vector backend per namespace: "chroma" or "local" (in-process NumPy index).
+# VECTOR_BACKEND_OVERRIDES maps a source type or full namespace name to a backend, e.g. "sql=local".
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_BACKEND_OVERRIDES = dict(
+    entry.strip().split("=", 1) for entry in os.getenv("VECTOR_BACKEND_OVERRIDES", "").split(",") if "=" in entry
+)
+
+# Streaming ingestion: items embedded per upsert, and extracted batches buffered ahead of the embedder
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_PREFETCH = int(os.getenv("INGEST_PREFETCH", "8"))
+# How often a producer blocked on a full prefetch buffer checks whether the consumer has stopped
+PREFETCH_POLL_SECONDS = 0.1
+
+def fingerprint_items(data_items: List[Dict[str, Any]]) -> str:
+    """
+    Compute a content hash of the embeddable data items.
+    """
+    digest = hashlib.sha256(f"index-v{INDEX_VERSION}:{embedding_engine.model_id}".encode("utf-8"))
+    for item in data_items:
+        if item.get("type") not in EMBEDDABLE_TYPES:
+            continue
+        record = [item.get("type"), item.get("page"), item.get("text", ""), item.get("image_ref") or item.get("image", "")]
+        digest.update(json.dumps(record).encode("utf-8"))
+    return digest.hexdigest()
+
+def fingerprint_file(filepath: str, *salt: str) -> str:
+    """
+    Compute a content hash of a file, mixed with the index version, the embedding model
+    and any extra salt (e.g. extractor settings that change what gets indexed).
+    """
+    digest = hashlib.sha256(f"index-v{INDEX_VERSION}:{embedding_engine.model_id}".encode("utf-8"))
+    for value in salt:
+        digest.update(f"\x00{value}".encode("utf-8"))
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def namespace_name(source_type: str, source_name: str) -> str:
+    """
+    Name of the collection (namespace) holding one source's vectors, e.g. one PDF or one database.
+    Each source gets its own collection, so queries never scan other sources.
+    """
+    return f"{source_type}_{hashlib.sha256(source_name.encode('utf-8')).hexdigest()[:32]}"
+
+def backend_for(collection_name: str) -> str:
+    """
+    Pick the vector backend for a namespace: exact override, then source type override, then the default.
+    """
+    if collection_name in VECTOR_BACKEND_OVERRIDES:
+        return VECTOR_BACKEND_OVERRIDES[collection_name]
+    return VECTOR_BACKEND_OVERRIDES.get(collection_name.split("_", 1)[0], VECTOR_BACKEND)
+
+def open_namespace(collection_name: str, source_type: Optional[str] = None, source_name: Optional[str] = None):
+    """
+    Open (creating if needed) the collection for a namespace on its configured backend.
+
+    Opening with a source_type is for writing: a collection built with another
+    embedding model is dropped first, since its vectors are not comparable.
+    """
+    if source_type:
+        existing = _open_backend(collection_name)
+        if (existing.metadata or {}).get("embedding_model", embedding_engine.model_id) != embedding_engine.model_id:
+            delete_namespace(collection_name)
+    collection = _open_backend(collection_name, source_type, source_name)
+    # Collections created before the source was known (e.g. by delete_pages) get labelled on next open
+    if source_type and (
+        (collection.metadata or {}).get("source_type") != source_type
+        or (collection.metadata or {}).get("embedding_model") != embedding_engine.model_id
+    ):
+        _update_metadata(collection, source_type=source_type, source_name=source_name,
+                         embedding_model=embedding_engine.model_id)
+    return collection
+
+def _open_backend(collection_name: str, source_type: Optional[str] = None, source_name: Optional[str] = None):
+    if backend_for(collection_name) == "local":
+        collection = LocalIndex(collection_name)
+    else:
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        vector_store = Chroma(
+            collection_name=collection_name,
+            persist_directory=CHROMA_DIR,
+            collection_metadata={"source_type": source_type, "source_name": source_name} if source_type else None
+        )
+        collection = vector_store._collection
+    return collection
+
+def _update_metadata(collection, **updates):
+    # Chroma replaces collection metadata wholesale, so merge with what is there
+    collection.modify(metadata={**(collection.metadata or {}), **updates})
+
+def list_namespaces() -> List[Dict[str, Any]]:
+    """
+    List the indexed sources with their namespace and vector count.
+    """
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    namespaces = []
+    for collection in client.list_collections():
+        if isinstance(collection, str):
+            collection = client.get_collection(collection)
+        metadata = collection.metadata or {}
+        namespaces.append({
+            "namespace": collection.name,
+            "backend": "chroma",
+            "source_type": metadata.get("source_type"),
+            "source_name": metadata.get("source_name"),
+            "count": collection.count()
+        })
+    for name in LocalIndex.names():
+        collection = LocalIndex(name)
+        namespaces.append({
+            "namespace": name,
+            "backend": "local",
+            "source_type": collection.metadata.get("source_type"),
+            "source_name": collection.metadata.get("source_name"),
+            "count": collection.count()
+        })
+    return namespaces
+
+def delete_namespace(collection_name: str) -> bool:
+    """
+    Drop a source's whole collection. Returns False if it did not exist.
+    """
+    deleted = LocalIndex.drop(collection_name)
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    try:
+        client.delete_collection(collection_name)
+        return True
+    except Exception:
+        return deleted
+
+def build_index(data_items: List[Dict[str, Any]], prefix: str = "pdf") -> Dict[str, Any]:
+    """
+    Embed the data items into a persisted Chroma collection and return a handle to it.
+
+    The collection name is derived from the content fingerprint, so building the
+    index for data that has already been indexed is a no-op.
+    """
+    fingerprint = fingerprint_items(data_items)
+    collection_name = f"{prefix}_{fingerprint[:32]}"
+    collection = open_namespace(collection_name, source_type=prefix, source_name=fingerprint)
+    items = [(item_id(item), item) for item in data_items if item.get("type") in EMBEDDABLE_TYPES]
+
+    if not (collection.metadata or {}).get("complete"):
+        written = add_embeddings(collection, items)
+        # Only mark the index complete if every item made it in, so failed
+        # embeddings are retried on the next build
+        if written >= len(items):
+            _update_metadata(collection, index_version=INDEX_VERSION, fingerprint=fingerprint, complete=True)
+
+    return {
+        "collection": collection_name,
+        "version": INDEX_VERSION,
+        "fingerprint": fingerprint,
+        "count": collection.count()
+    }
+
+def _prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Run the producer in a background thread, buffering at most maxsize batches.
+    A full buffer blocks the producer, so extraction never runs far ahead of embedding.
+    When the consumer stops early or fails, the producer stops too and the
+    iterable is closed, releasing whatever it holds open.
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    done = object()
+
+    def offer(value) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(value, timeout=PREFETCH_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in iterable:
+                if not offer(batch):
+                    break
+            else:
+                offer(done)
+        except BaseException as e:
+            offer(e)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    # The producer runs in a copy of this context, so it records spans into the caller's ingest trace
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True).start()
+    try:
+        while True:
+            batch = buffer.get()
+            if batch is done:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+    finally:
+        stop.set()
+
+def _strip_payload(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Inline base64 images are only needed for embedding; keep the lightweight fields
+    if "image" not in item:
+        return item
+    return {key: value for key, value in item.items() if key != "image"}
+
+def delete_pages(collection_name: str, pages: Optional[List[int]], exclude_types: Optional[List[str]] = None):
+    """
+    Delete the vectors of the given pages, or every vector in the collection if pages is None.
+    Items of exclude_types are left in place.
+    """
+    collection = open_namespace(collection_name)
+    if pages is None:
+        ids = collection.get(include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+    elif pages:
+        where = {"page": {"$in": list(pages)}}
+        if exclude_types:
+            where = {"$and": [where, {"type": {"$nin": list(exclude_types)}}]}
+        collection.delete(where=where)
+    _update_metadata(collection, index_version=INDEX_VERSION, fingerprint="", complete=False)
+
+def delete_items(collection_name: str, ids: List[str]) -> int:
+    """
+    Delete vectors by id. Returns the number of vectors left in the collection.
+    """
+    collection = open_namespace(collection_name)
+    if ids:
+        collection.delete(ids=list(ids))
+    return collection.count()
+
+def build_index_stream(item_batches: Iterable[List[Dict[str, Any]]], fingerprint: str, prefix: str = "pdf",
+                       batch_size: int = INGEST_BATCH_SIZE,
+                       collection_name: Optional[str] = None,
+                       source_name: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Embed and upsert items as they are extracted instead of after the whole document.
+
+    Items are embedded in batches of batch_size, so each batch is searchable as
+    soon as it lands and only one batch of image payloads is held at a time.
+    Vector ids are content-derived (see item_id) and carry page metadata, so a
+    page's vectors can be replaced on their own.
+    Returns the data items without their image payloads, plus the index handle.
+    """
+    collection_name = collection_name or f"{prefix}_{fingerprint[:32]}"
+    collection = open_namespace(collection_name, source_type=prefix, source_name=source_name or fingerprint)
+    metadata = collection.metadata or {}
+    already_built = metadata.get("complete") and metadata.get("fingerprint") == fingerprint
+
+    data_items = []
+    pending = []
+    expected = 0
+    written = 0
+
+    batches = _prefetch(item_batches, INGEST_PREFETCH)
+    try:
+        for items in batches:
+            for item in items:
+                if item.get("type") in EMBEDDABLE_TYPES:
+                    expected += 1
+                    if not already_built:
+                        pending.append((item_id(item), item))
+                data_items.append(_strip_payload(item))
+
+            while len(pending) >= batch_size:
+                written += add_embeddings(collection, pending[:batch_size])
+                pending = pending[batch_size:]
+    finally:
+        # Stops the extractor if embedding failed
+        batches.close()
+
+    if pending:
+        written += add_embeddings(collection, pending)
+
+    complete = bool(already_built) or written >= expected
+    if not already_built and complete:
+        _update_metadata(collection, index_version=INDEX_VERSION, fingerprint=fingerprint, complete=True)
+
+    return data_items, {
+        "collection": collection_name,
+        "version": INDEX_VERSION,
+        "fingerprint": fingerprint,
+        "count": collection.count(),
+        "complete": complete
+    }
+
+def build_schema_index(schema_items: List[Dict[str, Any]], source_name: str) -> Dict[str, Any]:
+    """
+    Embed a database's schema chunks into its namespace, once per schema version.
+
+    The fingerprint covers the schema text, the index version and the embedding
+    model. While the namespace holds a complete index with the same
+    fingerprint, nothing is embedded; a changed schema replaces the old vectors.
+    """
+    digest = hashlib.sha256(f"index-v{INDEX_VERSION}:{embedding_engine.model_id}".encode("utf-8"))
+    for item in schema_items:
+        digest.update(json.dumps([item.get("page"), item.get("text", "")]).encode("utf-8"))
+    fingerprint = digest.hexdigest()
+
+    collection_name = namespace_name("sql", source_name)
+    collection = open_namespace(collection_name, source_type="sql", source_name=source_name)
+    metadata = collection.metadata or {}
+    complete = bool(metadata.get("complete")) and metadata.get("fingerprint") == fingerprint
+    if not complete:
+        # Chunks of an older schema would still match queries
+        ids = collection.get(include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+        items = [(item_id(item), item) for item in schema_items if item.get("text")]
+        complete = add_embeddings(collection, items) >= len(items)
+        _update_metadata(collection, index_version=INDEX_VERSION, fingerprint=fingerprint, complete=complete)
+
+    return {
+        "collection": collection_name,
+        "version": INDEX_VERSION,
+        "fingerprint": fingerprint,
+        "count": collection.count(),
+        "complete": complete
+    }
+
+def open_index(handle: Dict[str, Any]):
+    """
+    Open the Chroma collection referenced by an index handle.
+    """
+    if handle.get("version") != INDEX_VERSION:
+        raise ValueError(f"Index version {handle.get('version')} is not supported (expected {INDEX_VERSION})")
+    return open_namespace(handle["collection"])
+
+def query_index(handle: Dict[str, Any], query_embedding: List[float], n_results: int = 2,
+                where: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Return the documents nearest to the query embedding, optionally filtered by
+    item metadata (e.g. {"type": "table"} or {"page": 3}).
+    """
+    count = handle.get("count", 0)
+    if count == 0:
+        return []
+
+    with metrics.timed("vector_query"):
+        collection = open_index(handle)
+        nearest_results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(n_results, count),
+            where=where
+        )
+    documents = nearest_results.get("documents") or []
+    return [doc for docs in documents for doc in (docs or []) if doc]